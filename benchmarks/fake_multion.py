@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(BENCHMARKS_DIR, "fixtures", "recorded_responses.json")
+PROFILES_PATH = os.path.join(os.path.dirname(BENCHMARKS_DIR), "sample_data.csv")
+
+STARGAZERS_PER_PAGE = 48
+
+
+def _count(value):
+    # Some sample profiles have no count, e.g. "None"
+    return int(value) if value.isdigit() else 0
+
+
+class FakeMultiOnError(ConnectionError):
+    """Injected transient failure, raised by retrieve() at the configured error rate."""
+
+
+class FakeSessions:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, url, **kwargs):
+        self.client._wait()
+        with self.client._lock:
+            self.client.counters["sessions_created"] += 1
+            session_id = f"fake-{self.client.counters['sessions_created']}"
+            self.client._urls[session_id] = url
+        return SimpleNamespace(session_id=session_id, status="CONTINUE", message="Session created")
+
+    def step(self, session_id, cmd, **kwargs):
+        self.client._wait()
+        with self.client._lock:
+            self.client.counters["steps"] += 1
+            url = re.search(r"https?://\S+", cmd)
+            if url:
+                self.client._urls[session_id] = url.group(0)
+        return SimpleNamespace(session_id=session_id, status="DONE", message="Navigated")
+
+    def close(self, session_id, **kwargs):
+        with self.client._lock:
+            self.client.counters["sessions_closed"] += 1
+            self.client._urls.pop(session_id, None)
+        return SimpleNamespace(session_id=session_id)
+
+
+class FakeMultiOn:
+    """
+    Offline stand-in for the MultiOn client, for benchmarking startrack without real sessions.
+
+    Implements sessions.create / sessions.step / sessions.close and retrieve. Responses are
+    the recorded responses in fixtures/recorded_responses.json, filled in with the profiles of
+    sample_data.csv, for a repository with num_stargazers synthetic stargazers (stargazer0,
+    stargazer1, ...). A linkedin_rate fraction of them link a LinkedIn profile. Every call
+    sleeps latency seconds (+-50%), or 10 times as long at slow_rate to reproduce a latency tail,
+    and retrieve() raises FakeMultiOnError at error_rate.
+    """
+
+    def __init__(self, api_key=None, num_stargazers=10, latency=0.02, error_rate=0.0, linkedin_rate=0.5,
+                 slow_rate=0.0, seed=0, fixtures_path=FIXTURES_PATH, profiles_path=PROFILES_PATH, **kwargs):
+        with open(fixtures_path, encoding="utf-8") as fixtures_file:
+            self.fixtures = json.load(fixtures_file)
+        with open(profiles_path, newline="", encoding="utf-8") as profiles_file:
+            self.profiles = list(csv.DictReader(profiles_file))
+        self.num_stargazers = num_stargazers
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.linkedin_rate = linkedin_rate
+        self.sessions = FakeSessions(self)
+        self.counters = {"sessions_created": 0, "sessions_closed": 0, "steps": 0, "retrieves": 0, "errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._urls = {}
+
+    def retrieve(self, cmd=None, session_id=None, url=None, **kwargs):
+        self._wait()
+        with self._lock:
+            self.counters["retrieves"] += 1
+            if url:
+                self._urls[session_id] = url
+            current_url = self._urls.get(session_id, url)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.counters["errors"] += 1
+        if failed:
+            raise FakeMultiOnError(f"Injected failure retrieving {current_url}")
+        return SimpleNamespace(data=self._respond(current_url, kwargs.get("max_items")))
+
+    def _respond(self, url, max_items):
+        if "/stargazers" in url:
+            page = int(url.split("page=")[1]) if "page=" in url else 1
+            start = (page - 1) * STARGAZERS_PER_PAGE
+            end = min(self.num_stargazers, start + min(max_items or STARGAZERS_PER_PAGE, STARGAZERS_PER_PAGE))
+            return [{"username": f"stargazer{i}"} for i in range(start, end)]
+        if "linkedin.com/in/" in url:
+            return [self._linkedin_profile(self._index(url))]
+        if url.rstrip("/").count("/") == 4:
+            return [dict(self.fixtures["repo"], number_of_stars=f"{self.num_stargazers:,}")]
+        return [self._github_user(self._index(url))]
+
+    def _github_user(self, index):
+        profile = self.profiles[index % len(self.profiles)]
+        login = f"stargazer{index}"
+        return dict(
+            self.fixtures["github_user"],
+            name=f"{profile['name']} {index}",
+            location=profile["location"],
+            github_followers_count=f"{_count(profile['github_followers']) + index:,}",
+            github_url=f"https://github.com/{login}",
+            linkedin_url=f"https://www.linkedin.com/in/{login}" if self._has_linkedin(index) else None,
+            email=f"Email: {login}@example.com" if index % 3 == 0 else "",
+        )
+
+    def _linkedin_profile(self, index):
+        profile = self.profiles[index % len(self.profiles)]
+        return dict(
+            self.fixtures["linkedin_profile"],
+            name=f"{profile['name']} {index}",
+            headline=profile["linkedin_headline"],
+            location=profile["location"],
+            current_position=profile["current_position"],
+            profile_url=f"https://www.linkedin.com/in/stargazer{index}",
+            num_followers=f"{_count(profile['linkedin_followers']):,}",
+        )
+
+    def _has_linkedin(self, index):
+        # Deterministic per user, so every run of a benchmark scrapes the same LinkedIn profiles
+        return (index * 7919) % 1000 < self.linkedin_rate * 1000
+
+    def _index(self, url):
+        match = re.search(r"stargazer(\d+)/?$", url)
+        return int(match.group(1)) if match else 0
+
+    def _wait(self):
+        if self.latency:
+            with self._lock:
+                delay = self.latency * self._random.uniform(0.5, 1.5)
+                if self._random.random() < self.slow_rate:
+                    delay *= 10
+            time.sleep(delay)
@@ -0,0 +1,60 @@
+"""
+Import-time budget of main.py, so short-lived runs (cron, --help, worker processes) start fast.
+
+Run from the repository root, e.g.:
+    python -m benchmarks.import_time --budget 0.5
+
+Imports main in a fresh interpreter a few times and fails (exit status 1) when the best time
+exceeds the budget, or when importing main pulled in one of the integration libraries that
+are only meant to be imported when their flag is set.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Libraries that importing main must not import
+LAZY_MODULES = ["multion", "agentops", "mailchimp3", "mem0", "neo4j", "pyarrow"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+
+def measure_import(repeat: int = 5) -> dict:
+    """Import main in repeat fresh interpreters and return the best time and the modules it imported."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(runs, key=lambda run: run["seconds"])
+    return {"seconds": best["seconds"], "eager_modules": [name for name in LAZY_MODULES if name in best["modules"]]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that importing main.py stays within a time budget.")
+    parser.add_argument("--budget", type=float, default=0.5,
+                        help="Maximum number of seconds importing main may take (default: 0.5)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of fresh interpreters to time, the best one counts (default: 5)")
+    args = parser.parse_args()
+
+    result = measure_import(args.repeat)
+    print(f"import main: {result['seconds']:.3f}s (budget {args.budget:g}s)")
+    failed = False
+    if result["eager_modules"]:
+        print(f"FAILED: importing main imports {', '.join(result['eager_modules'])}, which should be imported lazily")
+        failed = True
+    if result["seconds"] > args.budget:
+        print(f"FAILED: importing main took longer than {args.budget:g}s")
+        failed = True
+    sys.exit(1 if failed else 0)
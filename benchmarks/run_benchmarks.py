@@ -0,0 +1,256 @@
+"""
+End-to-end benchmarks of main.main against the fake MultiOn client.
+
+Run from the repository root, e.g.:
+    python -m benchmarks.run_benchmarks --sizes 10 1000 10000 --workers 8 --latency 0.02
+
+Each size runs main.main in a fresh temporary directory (so the profile cache and journal
+start empty) and records per-stage wall time, throughput and peak memory. Results are
+written as JSON to benchmarks/results/, and --baseline prints the change against an
+earlier result file.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.fake_multion import FakeMultiOn
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCHMARK_REPO_URL = "https://github.com/bench/startrack"
+
+
+class StageTimer:
+    """
+    Times calls to the methods that make up each pipeline stage.
+
+    Stages overlap when running with several workers, so every stage reports both its busy
+    time (summed over all calls and threads) and its wall time (first call start to last call end).
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def wrap(self, owner, name, stage, generator=False):
+        original = getattr(owner, name)
+
+        if generator:
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                iterator = original(*args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        self._record(stage, start, time.perf_counter())
+                        return
+                    self._record(stage, start, time.perf_counter())
+                    yield item
+        else:
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self._record(stage, start, time.perf_counter())
+
+        setattr(owner, name, wrapper)
+        self._patched.append((owner, name, original))
+
+    def restore(self):
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched = []
+
+    def report(self):
+        return {
+            stage: {
+                "calls": timing["calls"],
+                "busy_seconds": round(timing["busy"], 4),
+                "wall_seconds": round(timing["last_end"] - timing["first_start"], 4),
+            }
+            for stage, timing in self.stages.items()
+        }
+
+    def _record(self, stage, start, end):
+        with self._lock:
+            timing = self.stages.setdefault(stage, {"calls": 0, "busy": 0.0, "first_start": start, "last_end": end})
+            timing["calls"] += 1
+            timing["busy"] += end - start
+            timing["first_start"] = min(timing["first_start"], start)
+            timing["last_end"] = max(timing["last_end"], end)
+
+
+def run_benchmark(num_stargazers, workers, latency, error_rate, linkedin_rate, scrape_linkedin, seed, rate_limited=False,
+                  slow_rate=0.0, hedge=False):
+    """Run main.main once for num_stargazers fake stargazers and return its measurements."""
+    import main
+    import src.multion_utils
+    from src.metrics import metrics
+    from src.rate_limit import DEFAULT_RATE_LIMITS, RateLimit
+    from src.multion_utils import MultiOnUtils
+    from src.sinks import RowSink
+
+    clients = []
+
+    def make_client(**kwargs):
+        client = FakeMultiOn(num_stargazers=num_stargazers, latency=latency, error_rate=error_rate,
+                             linkedin_rate=linkedin_rate, slow_rate=slow_rate, seed=seed, **kwargs)
+        clients.append(client)
+        return client
+
+    # Without --rate-limited the limits are lifted, so the benchmark measures the pipeline itself
+    unlimited = {target: RateLimit(rate=1e9, burst=10 ** 9, max_concurrency=1024) for target in DEFAULT_RATE_LIMITS}
+
+    timer = StageTimer()
+    timer.wrap(MultiOnUtils, "scrape_repo", "repo")
+    timer.wrap(MultiOnUtils, "iter_stargazers", "stargazers", generator=True)
+    timer.wrap(MultiOnUtils, "scrape_github_batch", "github")
+    timer.wrap(MultiOnUtils, "scrape_linkedin", "linkedin")
+    timer.wrap(RowSink, "flush", "output")
+    original_client = src.multion_utils.create_multion_client
+    src.multion_utils.create_multion_client = make_client
+
+    cwd = os.getcwd()
+    error = None
+    metrics.reset()
+    with tempfile.TemporaryDirectory(prefix="startrack-bench-") as work_dir:
+        os.chdir(work_dir)
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            main.main(BENCHMARK_REPO_URL, max_stargazers=num_stargazers, scrape_linkedin=scrape_linkedin,
+                      workers=workers, metrics_textfile=None, metrics_json=None,
+                      rate_limits=None if rate_limited else unlimited, hedge=hedge)
+        except Exception as e:
+            # Reported with the results instead of aborting the other sizes
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            wall_seconds = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            os.chdir(cwd)
+            src.multion_utils.create_multion_client = original_client
+            timer.restore()
+
+    result = {
+        "stargazers": num_stargazers,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_per_second": round(num_stargazers / wall_seconds, 2) if wall_seconds else None,
+        "peak_memory_mb": round(peak_memory / 1024 / 1024, 2),
+        "stages": timer.report(),
+        "client": clients[0].counters if clients else {},
+        # Per-call latency histograms recorded by src.metrics during the run
+        "metrics": metrics.to_dict(),
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, baseline=None):
+    baseline_runs = {run["stargazers"]: run for run in (baseline or {}).get("runs", [])}
+    print(f"{'stargazers':>10} {'wall s':>10} {'users/s':>10} {'peak MB':>9}  stages (wall s)")
+    for run in results["runs"]:
+        stages = ", ".join(f"{stage} {timing['wall_seconds']:.2f}" for stage, timing in run["stages"].items())
+        line = (f"{run['stargazers']:>10} {run['wall_seconds']:>10.2f} {run['throughput_per_second'] or 0:>10.1f} "
+                f"{run['peak_memory_mb']:>9.1f}  {stages}")
+        previous = baseline_runs.get(run["stargazers"])
+        if previous and previous.get("wall_seconds"):
+            change = (run["wall_seconds"] - previous["wall_seconds"]) / previous["wall_seconds"] * 100
+            line += f"  ({change:+.1f}% wall vs {baseline['commit']})"
+        if "error" in run:
+            line += f"  FAILED: {run['error']}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark startrack end to end against a fake MultiOn client.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="Numbers of stargazers to benchmark (default: 10 1000 10000)")
+    parser.add_argument("-w", "--workers", type=int, default=8,
+                        help="Number of stargazers to scrape concurrently (default: 8)")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Mean latency in seconds of every fake MultiOn call (default: 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of fake retrieve calls that fail (default: 0)")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="Fraction of fake calls that take 10 times the latency (default: 0)")
+    parser.add_argument("--hedge", action="store_true", default=False,
+                        help="Hedge scrapes slower than the p95 latency")
+    parser.add_argument("--linkedin-rate", type=float, default=0.5,
+                        help="Fraction of stargazers with a LinkedIn profile (default: 0.5)")
+    parser.add_argument("--no-linkedin", action="store_true", default=False,
+                        help="Do not scrape LinkedIn profiles")
+    parser.add_argument("--rate-limited", action="store_true", default=False,
+                        help="Apply the default rate limits instead of lifting them")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the fake latency and errors (default: 0)")
+    parser.add_argument("--output", help="Path of the JSON results (default: benchmarks/results/<commit>_<time>.json)")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("-v", "--verbose", action="store_true", default=False, help="Show the output of main")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    # The benchmark measures the MultiOn path, never the GitHub API or real credentials
+    os.environ.pop("GITHUB_TOKEN", None)
+    os.environ["MULTION_API_KEY"] = "benchmark"
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {
+            "workers": args.workers,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "slow_rate": args.slow_rate,
+            "hedge": args.hedge,
+            "linkedin_rate": args.linkedin_rate,
+            "scrape_linkedin": not args.no_linkedin,
+            "seed": args.seed,
+            "rate_limited": args.rate_limited,
+        },
+        "runs": [],
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} stargazers...", file=sys.stderr)
+        results["runs"].append(run_benchmark(size, args.workers, args.latency, args.error_rate, args.linkedin_rate,
+                                             not args.no_linkedin, args.seed, args.rate_limited, args.slow_rate,
+                                             args.hedge))
+    # Peak resident memory of the whole benchmark process, including the interpreter and imports
+    results["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+    output_path = args.output or os.path.join(
+        RESULTS_DIR, f"{results['commit']}_{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+    print(f"Results written to {output_path}")
@@ -1,118 +1,191 @@
+import argparse
+import os
+
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-csv_file_path = 'sample_data.csv'
-df = pd.read_csv(csv_file_path)
+from src.geo_utils import Gazetteer
+from src.timeline import TimelineCache, list_snapshots
+
+# Only these columns are read, the others can be large (headlines) and are not shown
+COLUMN_DTYPES = {
+    'username': 'string',
+    'name': 'string',
+    'location': 'string',
+    'current_position': 'string',
+    'linkedin': 'string',
+    'github_followers': 'string',  # Older files wrote None for missing counts, converted below
+    'country': 'string',
+    'lat': 'float64',
+    'lon': 'float64',
+}
+TABLE_COLUMNS = [('name', 'Stargazer'), ('current_position', 'Current position'), ('linkedin', 'LinkedIn')]
+
+
+def read_stargazers(path):
+    """Read the columns of a stargazers file (CSV, JSONL or Parquet) that the dashboard needs."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        columns = [column for column in pq.read_schema(path).names if column in COLUMN_DTYPES]
+        df = pd.read_parquet(path, columns=columns)
+    elif path.endswith('.jsonl'):
+        df = pd.read_json(path, lines=True, dtype=False)
+        df = df[[column for column in df.columns if column in COLUMN_DTYPES]]
+    else:
+        df = pd.read_csv(path, usecols=lambda column: column in COLUMN_DTYPES,
+                         dtype={column: dtype for column, dtype in COLUMN_DTYPES.items()},
+                         keep_default_na=False, na_values={'lat': [''], 'lon': ['']})
+    if 'github_followers' in df.columns:
+        df['github_followers'] = pd.to_numeric(df['github_followers'], errors='coerce').fillna(0).astype('int64')
+    else:
+        df['github_followers'] = 0
+    for column, _ in TABLE_COLUMNS:
+        if column not in df.columns:
+            df[column] = ''
+    return df
+
+
+def aggregate_locations(df, level):
+    """Number of stargazers per city (distinct coordinates) or per country, with coordinates to plot them at."""
+    if not {'country', 'lat', 'lon'}.issubset(df.columns):
+        raise SystemExit("The input has no country/lat/lon columns, add them with: python -m src.geo_utils <file>")
+    located = df.dropna(subset=['lat', 'lon'])
+    if level == 'country':
+        counts = located.groupby('country', observed=True).size().rename('stargazers').reset_index()
+        coordinates = pd.DataFrame([(place.name, place.lat, place.lon) for place in Gazetteer().countries.values()],
+                                   columns=['country', 'lat', 'lon'])
+        counts = counts.merge(coordinates, on='country', how='inner')
+        counts['label'] = counts['country']
+    else:
+        counts = (located.groupby(['lat', 'lon'], observed=True)
+                  .agg(stargazers=('lat', 'size'), country=('country', 'first'), label=('location', 'first'))
+                  .reset_index())
+    return counts.sort_values('stargazers', ascending=False, ignore_index=True)
+
 
-def create_contact_table(df):
-    fig = go.Figure(data=[go.Table(
+def contact_pages(df, max_contacts, page_size):
+    """The table cells of the max_contacts most followed stargazers, split into pages."""
+    top = df.nlargest(max_contacts, 'github_followers') if len(df) > max_contacts else df
+    cells = [top[column].fillna('').astype(str).replace('None', '').tolist() for column, _ in TABLE_COLUMNS]
+    return [[values[start:start + page_size] for values in cells]
+            for start in range(0, max(len(top), 1), page_size)]
+
+
+def create_contact_table(pages):
+    return go.Table(
         header=dict(
-            values=['<b>Stargazer</b>', '<b>Current position</b>', '<b>LinkedIn</b>'],
+            values=[f'<b>{title}</b>' for _, title in TABLE_COLUMNS],
             fill_color='#4285f4',
             align='center',
             font=dict(color='white', size=14),
             height=40
         ),
         cells=dict(
-            values=[
-                [f'{name}' for name in df.name],
-                # [f'<a href="mailto:{email}">{name}</a>' for name in df.name],
-                [f'{current_position}' for current_position in df.current_position],
-                [f'{url}' for url in df.linkedin],
-            ],
+            values=pages[0],
             fill_color=['white', '#f8f9fa'],
-            align=['left', 'left', 'left', 'left'],
+            align='left',
             font=dict(color='#666', size=12),
             height=30
         )
-    )])
-    
-    fig.update_layout(
-        margin=dict(l=0, r=0, t=0, b=50),
-        height=600,  # Increased height to accommodate more rows
-        width=1000   # Adjusted width for the four columns
     )
-    return fig
-    
-    fig.update_layout(
-        margin=dict(l=0, r=0, t=0, b=50),
-        height=400,
-        width=1000  # Increased width to accommodate more columns
+
+
+def create_location_map(counts):
+    # One marker per city or country, so the map stays the same size however many stargazers there are
+    sizes = counts['stargazers'] ** 0.5
+    return go.Scattergeo(
+        lat=counts['lat'], lon=counts['lon'],
+        text=counts['label'],
+        customdata=counts[['country', 'stargazers']],
+        hovertemplate='<b>%{text}</b><br>%{customdata[0]}<br>%{customdata[1]} stargazers<extra></extra>',
+        marker=dict(size=6 + 24 * sizes / max(sizes.max(), 1), color='#4A90E2', opacity=0.7,
+                    line=dict(width=0.5, color='white')),
     )
-    return fig
 
 
+def create_dashboard(df, level='city', max_contacts=1000, page_size=50):
+    pages = contact_pages(df, max_contacts, page_size)
+    counts = aggregate_locations(df, level)
 
-#Create map 
-def create_location_map(df):
-    fig = px.scatter_geo(df, locations='location', locationmode='country names',
-                         hover_name='email', projection='natural earth',
-                         color_discrete_sequence=['#4A90E2'])
-    fig.update_geos(showcoastlines=True, coastlinecolor="RebeccaPurple", 
-                    showland=True, landcolor="LightGreen",
-                    showocean=True, oceancolor="LightBlue",
-                    showlakes=True, lakecolor="Blue",
-                    showrivers=True, rivercolor="Blue")
-    fig.update_layout(height=400, width=600, margin=dict(l=0, r=0, t=0, b=50))
+    combined_fig = make_subplots(rows=1, cols=2, column_widths=[0.6, 0.4],
+                                 specs=[[{"type": "table"}, {"type": "scattergeo"}]],
+                                 horizontal_spacing=0.02)
+    combined_fig.add_trace(create_contact_table(pages), row=1, col=1)
+    combined_fig.add_trace(create_location_map(counts), row=1, col=2)
+
+    if len(pages) > 1:
+        # Each page only restyles the table cells, the map is not redrawn
+        combined_fig.update_layout(sliders=[dict(
+            active=0,
+            currentvalue=dict(prefix='Page '),
+            x=0, len=0.58, y=-0.02,
+            steps=[dict(method='restyle', label=str(number), args=[{'cells.values': [page]}, [0]])
+                   for number, page in enumerate(pages, start=1)],
+        )])
+
+    combined_fig.update_layout(
+        height=500,
+        width=1400,
+        showlegend=False,
+        margin=dict(t=200, b=100, l=100, r=20),
+        paper_bgcolor='white',
+        plot_bgcolor='white'
+    )
+    combined_fig.add_annotation(
+        x=0.25, y=-0.15,
+        text=f"<b>Contact Info</b> (top {min(len(df), max_contacts)} of {len(df)} by followers)",
+        showarrow=False,
+        xref="paper", yref="paper",
+        font=dict(size=14),
+        align='center'
+    )
+    combined_fig.add_annotation(
+        x=0.85, y=-0.15,
+        text=f"<b>Global Stars</b> ({int(counts['stargazers'].sum())} located)",
+        showarrow=False,
+        xref="paper", yref="paper",
+        font=dict(size=14),
+        align='center'
+    )
+    combined_fig.update_geos(projection_type="natural earth",
+                             showcoastlines=True, coastlinecolor="RebeccaPurple",
+                             showland=True, landcolor="LightGreen",
+                             showocean=True, oceancolor="LightBlue",
+                             showlakes=True, lakecolor="Blue",
+                             showrivers=True, rivercolor="Blue")
+    return combined_fig
+
+
+def create_timeline(aggregates):
+    """Stars, new and churned stargazers, and follower reach of every snapshot, one line per repo."""
+    timeline = pd.DataFrame([vars(aggregate) for aggregate in aggregates])
+    timeline['time'] = pd.to_datetime(timeline['timestamp'], unit='s')
+    timeline['repo'] = timeline['repo'].str.replace('https://github.com/', '', regex=False)
+
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=("Stars", "New and churned stargazers", "Reach (followers of stargazers)"))
+    for repo, repo_timeline in timeline.groupby('repo', sort=True):
+        fig.add_trace(go.Scatter(x=repo_timeline['time'], y=repo_timeline['stargazers'], mode='lines+markers',
+                                 name=repo, legendgroup=repo), row=1, col=1)
+        fig.add_trace(go.Bar(x=repo_timeline['time'], y=repo_timeline['new'], name=f'{repo} new',
+                             legendgroup=repo, marker_color='#34a853'), row=2, col=1)
+        fig.add_trace(go.Bar(x=repo_timeline['time'], y=-repo_timeline['churned'], name=f'{repo} churned',
+                             legendgroup=repo, marker_color='#ea4335'), row=2, col=1)
+        fig.add_trace(go.Scatter(x=repo_timeline['time'], y=repo_timeline['reach'], mode='lines+markers',
+                                 name=f'{repo} reach', legendgroup=repo), row=3, col=1)
+    fig.update_layout(height=900, width=1400, barmode='relative', paper_bgcolor='white', plot_bgcolor='white',
+                      margin=dict(t=60, b=40, l=80, r=20))
     return fig
 
-# Create a combined figure
-combined_fig = make_subplots(rows=1, cols=2, column_widths=[0.6, 0.4], 
-                             specs=[[{"type": "table"}, {"type": "scattergeo"}]],
-                             horizontal_spacing=0.02)
-
-# Add contact table to the left subplot
-contact_table = create_contact_table(df)
-combined_fig.add_trace(contact_table.data[0], row=1, col=1)
-
-# Add location map to the right subplot
-location_map = create_location_map(df)
-combined_fig.add_trace(location_map.data[0], row=1, col=2)
-
-# Update layout for better aesthetics
-combined_fig.update_layout(
-    height=500,
-    width=1400,
-    showlegend=False,
-    margin=dict(t=200, b=100, l=100, r=20),  # Increased left margin to move content right
-    paper_bgcolor='white',
-    plot_bgcolor='white'
-)
-# Add annotations for titles
-combined_fig.add_annotation(
-    x=0.25, y=-0.15,  # Adjusted x position for centering
-    text="<b>Contact Info</b>", 
-    showarrow=False, 
-    xref="paper", yref="paper", 
-    font=dict(size=14),
-    align='center'
-)
-combined_fig.add_annotation(
-    x=0.85, y=-0.15,  # Adjusted x position for centering
-    text="<b>Global Stars</b>", 
-    showarrow=False, 
-    xref="paper", yref="paper", 
-    font=dict(size=14),
-    align='center'
-)
-
-# Update geo subplot properties
-combined_fig.update_geos(projection_type="natural earth")
-
-# Get the plot's div and script
-plot_div = combined_fig.to_html(full_html=False, include_plotlyjs='cdn', config={'responsive': True})
-
-#HTML template
-custom_html = f"""
+
+HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Contact Information and User Locations</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
     <style>
         body {{
             display: flex;
@@ -129,9 +202,6 @@ custom_html = f"""
             padding: 20px;
             box-sizing: border-box;
         }}
-        .js-plotly-plot .plotly .modebar {{
-            display: none !important;
-        }}
         .js-plotly-plot .plotly .table-cell a {{
             color: #4A90E2;
             text-decoration: none;
@@ -170,19 +240,56 @@ custom_html = f"""
         </div>
     </div>
 </body>
-</html
+</html>
 """
 
-# Ensure links are clickable
-config = {'displayModeBar': False}
-plot_div = combined_fig.to_html(full_html=False, include_plotlyjs='cdn', config=config)
 
-# Write the custom HTML to a file
-with open("data/combined_visualization.html", "w") as f:
-    f.write(custom_html)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a dashboard of the stargazers in a snapshot file.")
+    parser.add_argument("input", nargs="?", default="sample_data.csv",
+                        help="Stargazers file written by main.py, CSV, JSONL or Parquet (default: sample_data.csv)")
+    parser.add_argument("-o", "--output",
+                        help="HTML file to write (default: data/combined_visualization.html)")
+    parser.add_argument("--map-level", choices=["city", "country"], default="city",
+                        help="Aggregate map markers per city or per country (default: city)")
+    parser.add_argument("--max-contacts", type=int, default=1000,
+                        help="Number of stargazers listed in the table, the most followed first (default: 1000)")
+    parser.add_argument("--page-size", type=int, default=50,
+                        help="Stargazers per table page (default: 50)")
+    parser.add_argument("--timeline", action="store_true",
+                        help="Render the star growth of every repo from all snapshots in data/ instead, "
+                             "to data/timeline.html unless --output is given")
+    parser.add_argument("--show", action="store_true",
+                        help="Also open the dashboard in a browser")
+    args = parser.parse_args()
+    if args.max_contacts < 1 or args.page_size < 1:
+        parser.error("--max-contacts and --page-size must be at least 1")
+
+    if args.timeline:
+        # Only snapshots that are new or changed since the last rendering are read
+        timeline_cache = TimelineCache()
+        aggregates = timeline_cache.update(list_snapshots())
+        if not aggregates:
+            raise SystemExit("No snapshots found in data/, run main.py first")
+        timeline_cache.save()
+        args.output = args.output or os.path.join("data", "timeline.html")
+        combined_fig = create_timeline(aggregates)
+        summary = f"{len(aggregates)} snapshots ({timeline_cache.files_read} files read)"
+    else:
+        df = read_stargazers(args.input)
+        args.output = args.output or os.path.join("data", "combined_visualization.html")
+        combined_fig = create_dashboard(df, level=args.map_level, max_contacts=args.max_contacts,
+                                        page_size=args.page_size)
+        summary = f"{len(df)} stargazers"
+
+    # Rendered once, with plotly.js loaded once from the CDN
+    plot_div = combined_fig.to_html(full_html=False, include_plotlyjs='cdn',
+                                    config={'displayModeBar': False, 'responsive': True})
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(HTML_TEMPLATE.format(plot_div=plot_div))
 
-#success message 
-print("Combined visualization saved as combined_visualization.html")
+    print(f"Visualization of {summary} saved as {args.output}")
 
-# Optionally, display the combined figure
-combined_fig.show()
+    if args.show:
+        combined_fig.show()
@@ -1,168 +1,453 @@
 import argparse
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
-from src.mailchimp_adapter import MailchimpAdapter
-from src.multion_utils import MultiOnUtils
-from src.mem0_utils import MemorySystem
+from src.multion_utils import MultiOnUtils, RepoData, StargazerData
+from src.github_api_utils import GitHubAPIUtils
+from src.enrichment import StargazerEnricher
+from src.integrations import load_integration
+from src.geo_utils import LOCATION_FIELD_NAMES, LocationNormalizer
+from src.identity import IdentityIndex, normalize_login
+from src.metrics import metrics
+from src.rate_limit import RateLimiter, parse_rate_limit
+from src.resilience import Resilience, RetryPolicy
+from src.profile_cache import ProfileCache
+from src.projection import build_projections, needed_columns
+from src.journal import RunJournal
+from src.watch_utils import RepoWatcher
+from src.sinks import SINKS, RowSink, open_sink
+from src.snapshot_utils import latest_snapshot, membership_filename, read_snapshot, record_snapshot, snapshot_filename
 from src.time_utils import Time
-import csv
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+METRICS_TEXTFILE = os.path.join('data', 'metrics.prom')
+METRICS_JSON = os.path.join('data', 'metrics.json')
+
+FIELD_NAMES = ['username', 'email', 'name', 'location', 'github_followers', 'linkedin_headline', 'current_position',
+               'linkedin_followers'] + LOCATION_FIELD_NAMES
+MEMBERSHIP_FIELD_NAMES = ['username', 'repo_url', 'starred_at']
+
+
+def build_row(user, linkedin_profile):
+    """
+    Combine a user's GitHub and LinkedIn data into one output row.
+
+    Each field takes the first non-empty value in a fixed order of sources, so the row does not
+    depend on which scrape finished first.
+    """
+    return {
+        'username': user.username or user.name,
+        'email': user.email or (linkedin_profile.email if linkedin_profile else '') or '',
+        'name': (linkedin_profile.name if linkedin_profile else '') or user.name,
+        'location': (linkedin_profile.location if linkedin_profile else '') or user.location or '',
+        'github_followers': user.num_followers,
+        'linkedin_headline': getattr(linkedin_profile, 'headline', ''),
+        'current_position': getattr(linkedin_profile, 'curr_job', ''),
+        'linkedin_followers': getattr(linkedin_profile, 'num_followers', '')
+    }
+
+
+@dataclass
+class TrackedRepo:
+    """
+    A repository tracked by a run: its stargazers and the snapshot files their rows are written to.
+
+    Users are enriched once for all repos, so a repo's rows can complete out of its own stargazer
+    order. write_ready() writes the completed rows at the front of the repo's stargazers, keeping
+    every snapshot in stargazer order.
+    """
+    url: str
+    repo: RepoData
+    previous_rows: Dict[str, dict] = field(default_factory=dict)
+    stargazers: List[StargazerData] = field(default_factory=list)
+    new_stargazers: List[StargazerData] = field(default_factory=list)
+    sink: Optional[RowSink] = None
+    delta_sink: Optional[RowSink] = None
+    written: int = 0
+
+    def write_ready(self, rows: Dict[str, Optional[dict]]):
+        while self.written < len(self.stargazers):
+            user_id = self.stargazers[self.written].user_id
+            if user_id not in rows:
+                break
+            row = rows[user_id]
+            if row is not None:
+                self.sink.write(row)
+                if self.delta_sink and user_id not in self.previous_rows:
+                    self.delta_sink.write(row)
+            self.written += 1
+
+    def graph_rows(self, rows: Dict[str, Optional[dict]]) -> List[dict]:
+        """Knowledge graph rows of the new stargazers"""
+        return [
+            {'login': stargazer.user_id, 'name': rows[stargazer.user_id].get('name') or '',
+             'location': rows[stargazer.user_id].get('location') or '',
+             'followers': int(rows[stargazer.user_id].get('github_followers') or 0), 'starred_at': stargazer.starred_at}
+            for stargazer in self.new_stargazers if rows.get(stargazer.user_id)
+        ]
+
+    def emails(self, rows: Dict[str, Optional[dict]]) -> List[str]:
+        """Emails of the new stargazers"""
+        return [rows[stargazer.user_id]['email'] for stargazer in self.new_stargazers
+                if rows.get(stargazer.user_id) and rows[stargazer.user_id].get('email')]
+
+    def close(self, complete: bool = True):
+        """Close the snapshot files, an incomplete run leaves them under their partial names."""
+        if self.sink:
+            self.sink.close(complete)
+        if self.delta_sink:
+            self.delta_sink.close(complete)
+
+
 def main(
-        repo_url,
+        repo_urls,
         max_stargazers=None,
         scrape_linkedin=False,
         use_agentops=False,
         use_mem0=False,
         use_neo4j_kg=False,
-        use_mailchimp=False
+        use_mailchimp=False,
+        workers=1,
+        refresh=False,
+        max_age=24,
+        incremental=False,
+        write_delta=False,
+        linkedin_max_steps=10,
+        linkedin_timeout=120,
+        output_format='csv',
+        resume_run_id=None,
+        mem0_parallelism=4,
+        metrics_textfile=METRICS_TEXTFILE,
+        metrics_json=METRICS_JSON,
+        rate_limits=None,
+        retries=2,
+        hedge=False,
+        columns=None
     ):
     """
     Main function to scrape GitHub and LinkedIn data.
 
-    This function takes in a GitHub repository URL and several optional parameters:
-    max_stargazers: Maximum number of stargazers to scrape
+    This function takes in one GitHub repository URL or a list of them and several optional parameters:
+    max_stargazers: Maximum number of stargazers to scrape per repository
     scrape_linkedin: Whether to scrape LinkedIn profiles
     use_mem0: Whether to use Mem0 memory system
-    use_neo4j_kg: Whether to use Neo4j knowledge graph
-    The function scrapes the repository and its stargazers, then scrapes GitHub data for each stargazer. If scrape_linkedin is True, it also scrapes LinkedIn data for users with LinkedIn URLs. The function then writes the collected data to a CSV file.
+    use_neo4j_kg: Whether to load stargazers into the Neo4j knowledge graph
+    workers: Number of concurrent scraping sessions used to enrich stargazers
+    refresh: Whether to ignore cached profiles and scrape every user again
+    max_age: Maximum age in hours of a cached profile before it is scraped again
+    incremental: Whether to only scrape stargazers missing from the latest snapshots of the repos
+    write_delta: Whether to also write the newly found stargazers to a separate delta file
+    linkedin_max_steps: Maximum number of agent steps spent navigating to one LinkedIn profile
+    linkedin_timeout: Maximum number of seconds spent navigating to one LinkedIn profile
+    output_format: Format of the output file: csv, jsonl or parquet
+    resume_run_id: Id of an interrupted run to resume; profiles it already scraped are not scraped again
+    mem0_parallelism: Number of facts added to Mem0 concurrently
+    metrics_textfile: Path of the Prometheus textfile the run's metrics are written to, None to skip it
+    metrics_json: Path of the JSON file the run's metrics are written to, None to skip it
+    rate_limits: Dict of target (github, linkedin, multion, github_api) to RateLimit, overriding the default limits
+    retries: Number of times a MultiOn scrape that failed with a transient error is retried
+    hedge: Whether to start a second session for MultiOn scrapes slower than the p95 latency and keep the first answer
+    columns: Output columns to write, a subset of FIELD_NAMES (default: all of them). Profiles are only scraped for the fields these columns and the enabled integrations need
+    The function scrapes the repositories and their stargazers, then scrapes GitHub data for each stargazer. If scrape_linkedin is True, it also scrapes LinkedIn data for users with LinkedIn URLs. Each user's data is written to the output file of every repository they starred as soon as it is complete.
+    Users who starred several of the repositories are only scraped once, and with more than one repository a user x repo membership table is written as well.
 
-    It prints various debugging messages throughout its execution.
+    Progress is logged at INFO level and raw scraped data at DEBUG level. Every remote call is timed,
+    and a summary of the run's metrics is logged at the end.
     """
-    multion_scraper = MultiOnUtils(use_agentops=use_agentops)
-    if use_mailchimp == True:
-        mailchimp_adapter = MailchimpAdapter()
-    agent_name = "StarTracker"
-
-    # Step 1: Scrape repo and stargazers
-    print(f"Scraping repo: {repo_url}")
-    repo = multion_scraper.scrape_repo(repo_url)
-    print(f"Scraped repo: {repo}")
-
-    print(f"Scraping stargazers: {repo}")
-    stargazers = multion_scraper.scrape_stargazers(repo_url)
-    if max_stargazers:
-        stargazers = stargazers[:max_stargazers]
-    print(f"Scraped {len(stargazers)} stargazers")
-
-    # Step 2: Scrape GitHub data for each stargazer
-    github_user_data = []
-    for stargazer in stargazers:
-        user_data = multion_scraper.scrape_github(stargazer.user_id)
-        github_user_data.append(user_data)
-    github_user_data = list({user.name: user for user in github_user_data}.values())
-    print(f"Scraped GitHub data for {len(github_user_data)} users")
-
-    # Step 3: Scrape LinkedIn data for users with LinkedIn URLs
-    linkedin_data = {}
-    if scrape_linkedin == True:
-        for user in github_user_data:
-            if user.linkedin_url:
-                linkedin_profile = multion_scraper.scrape_linkedin(user.linkedin_url)
-                if linkedin_profile.name:  # Only add if we got a valid name
-                    linkedin_data[user.name] = linkedin_profile
-    print(f"Scraped LinkedIn data for {len(linkedin_data)} users")
+    if isinstance(repo_urls, str):
+        repo_urls = [repo_urls]
+    # Integrations are only imported when enabled, but before scraping, so a missing package fails fast
+    integrations = {name: load_integration(name) for name, enabled in
+                    (("mailchimp", use_mailchimp), ("mem0", use_mem0), ("neo4j", use_neo4j_kg)) if enabled}
+    # One limiter for every scraper, so requests to the same site share its limits
+    rate_limiter = RateLimiter(rate_limits)
+    # Scrapes only retrieve the fields the output columns and integrations use
+    output_columns = ['username'] + [name for name in FIELD_NAMES if name != 'username' and (columns is None or name in columns)]
+    projections = build_projections(output_columns, scrape_linkedin=scrape_linkedin, integrations=integrations)
+    # Read GitHub data from the GitHub API when a token is configured, MultiOn is then only used for
+    # LinkedIn and for LinkedIn URLs missing from the API, and not set up at all without LinkedIn
+    use_github_api = bool(os.environ.get("GITHUB_TOKEN"))
+    # Shared by both scrapers, the GitHub API and MultiOn have circuit breakers of their own
+    # Up to one hedge in flight per ten workers, each with a MultiOn session kept free for it
+    resilience = Resilience(RetryPolicy(max_attempts=retries + 1), hedge=hedge,
+                            max_concurrent_hedges=max(1, math.ceil(workers / 10)))
+    multion_scraper = None
+    journal = None
+    profile_cache = None
+    try:
+        if scrape_linkedin or not use_github_api:
+            multion_scraper = MultiOnUtils(use_agentops=use_agentops, pool_size=workers,
+                                           linkedin_max_steps=linkedin_max_steps, linkedin_timeout=linkedin_timeout,
+                                           rate_limiter=rate_limiter,
+                                           resilience=resilience,
+                                           projections=projections)
+        if use_github_api:
+            github_scraper = GitHubAPIUtils(fallback=multion_scraper, rate_limiter=rate_limiter, resilience=resilience)
+        else:
+            github_scraper = multion_scraper
+        if use_mailchimp == True:
+            mailchimp_adapter = integrations["mailchimp"]()
+        agent_name = "StarTracker"
 
-    # Step 4 Print or process the collected data as needed
-    print("\nGitHub User Data:")
-    for user in github_user_data:
-        print(user)
+        # Step 1: Scrape repos
+        tracked_repos = []
+        with metrics.timed("stage", stage="repo"):
+            for repo_url in repo_urls:
+                logger.info(f"Scraping repo: {repo_url}")
+                repo = github_scraper.scrape_repo(repo_url)
+                logger.info(f"Scraped repo: {repo}")
+                tracked = TrackedRepo(url=repo_url, repo=repo)
+                if incremental:
+                    # Only scrape stargazers that were not in the latest snapshot of this repo
+                    previous_snapshot = latest_snapshot(repo_url, repo)
+                    tracked.previous_rows = read_snapshot(previous_snapshot) if previous_snapshot else {}
+                    logger.info(f"Comparing stargazers with {previous_snapshot or 'an empty snapshot (first run)'}")
+                tracked_repos.append(tracked)
 
-    if scrape_linkedin == True:
-        print("\nLinkedIn Data:")
-        for name, profile in linkedin_data.items():
-            print(f"{name}: {profile}")
+        # A user found in the previous snapshot of any of the repos is not scraped again, their row is
+        # carried over to every repo they starred. Only rows with every column this run needs are carried
+        # over (the location columns are derived from the location), so users from a snapshot written
+        # with fewer --columns are scraped again.
+        carried_columns = needed_columns(output_columns, integrations) - set(LOCATION_FIELD_NAMES)
+        if carried_columns.isdisjoint(LOCATION_FIELD_NAMES) and set(output_columns) & set(LOCATION_FIELD_NAMES):
+            carried_columns.add('location')
+        known_rows = {}
+        for tracked in tracked_repos:
+            known_rows.update({user_id: row for user_id, row in tracked.previous_rows.items() if carried_columns <= row.keys()})
+        incomplete_rows = {user_id for tracked in tracked_repos for user_id in tracked.previous_rows} - set(known_rows)
+        if incomplete_rows:
+            logger.info(f"Scraping {len(incomplete_rows)} previous stargazers again, their rows lack columns of this run")
 
-    print("---\nScraping completed")
+        # Stargazers of all repos are enumerated page by page, and enrichment starts as soon as the first page arrives.
+        # Users who starred several of the repos are only passed to the enricher the first time they are seen.
+        identities = IdentityIndex()
 
+        def stargazers_to_scrape():
+            for tracked in tracked_repos:
+                logger.info(f"Scraping stargazers: {tracked.repo}")
+                # Pages can shift while they are read, so the same login can be listed twice
+                seen_logins = set()
+                # Incremental runs skip the stargazer pages of the previous snapshot, its users are carried over
+                for stargazer in github_scraper.iter_stargazers(tracked.url, max_stargazers,
+                                                                known=list(tracked.previous_rows),
+                                                                num_stars=tracked.repo.num_stars):
+                    login = normalize_login(stargazer.user_id)
+                    if login in seen_logins:
+                        continue
+                    seen_logins.add(login)
+                    is_new = identities.add_stargazer(stargazer)
+                    tracked.stargazers.append(stargazer)
+                    if stargazer.user_id not in tracked.previous_rows:
+                        tracked.new_stargazers.append(stargazer)
+                    if is_new:
+                        yield stargazer
 
-    # Step 4 Initialize Mem0 memory
-    if use_mem0 == True:
-        memory_system = MemorySystem()
-        memory = memory_system.get_memory()
-        # memory.reset()
+        # Step 2 & 3: Scrape GitHub data for each stargazer and LinkedIn data for users with LinkedIn URLs.
+        # Both run on a bounded worker pool; a user's LinkedIn scrape starts as soon as their GitHub data arrives.
+        # Rows are written to the output files in stargazer order as soon as they are complete.
+        # Every scraped profile is journaled, so an interrupted run can be resumed with --resume <run id>
+        run_id = resume_run_id or str(Time())
+        journal = RunJournal(run_id, " ".join(repo_urls), resume=resume_run_id is not None)
+        if resume_run_id:
+            logger.info(f"Resuming run {run_id} with {journal.replayed} profiles already scraped")
+        else:
+            logger.info(f"Run id: {run_id} (if interrupted, continue with --resume {run_id})")
 
-        # Step 4a Memorize stargazers of each repository on a Knowledge Graph
-        if use_neo4j_kg == True:
-            print(f"Updating knowledge graph")
-            repositories = [repo_url]
-            # Iterate over the list of repositories
-
-            for repository in repositories:
-                print(f"Upserting repository: {repository}")
-                result_repository = memory.add(
-                    f"The github user: {stargazer.user_id} starred the repository: {repository}",
-                    user_id=None,
-                    agent_id=agent_name,
-                    run_id=str(Time()),
-                    metadata={'app_id': repository},
-                )
-
-                # Iterate over the list of usernames for each repository
-                for stargazer in stargazers:
-                    print(f"  Upserting username: {stargazer.user_id}")
-
-                    result_stargazer = memory.add(
-                        f"The github user: {stargazer.user_id} starred the repository: {repository}",
-                        user_id=stargazer.user_id,
+        profile_cache = ProfileCache(max_age_hours=max_age, refresh=refresh, projections=projections)
+        enricher = StargazerEnricher(github_scraper, workers=workers, scrape_linkedin=scrape_linkedin, cache=profile_cache,
+                                     linkedin_scraper=multion_scraper, journal=journal)
+
+        timestamp = str(Time())
+        output_filenames = set()
+        for index, tracked in enumerate(tracked_repos):
+            output_filename = snapshot_filename(tracked.repo, timestamp, extension=output_format)
+            file_timestamp = timestamp
+            if output_filename in output_filenames:
+                # Repos with the same description would otherwise share a file name
+                file_timestamp = f"{timestamp}_{index}"
+                output_filename = snapshot_filename(tracked.repo, file_timestamp, extension=output_format)
+            output_filenames.add(output_filename)
+            tracked.sink = open_sink(output_filename, output_columns, output_format)
+            if incremental and write_delta:
+                tracked.delta_sink = open_sink(snapshot_filename(tracked.repo, file_timestamp, delta=True, extension=output_format),
+                                               output_columns, output_format)
+            logger.info(f"Writing stargazers data to {output_filename}")
+
+        # Output row of every user, None for users without a row. Shared by all repos, so each user is scraped once.
+        # Every login gets its own row, even when several logins turn out to be the same person.
+        rows = {}
+        # Locations are resolved offline to a country and coordinates once here, so dashboards never geocode
+        locations = LocationNormalizer()
+        github_user_data = []
+        linkedin_data = {}
+        with metrics.timed("stage", stage="enrich"):
+            completed = False
+            try:
+                for stargazer, user, linkedin_profile in enricher.enrich(
+                        stargazers_to_scrape(), skip=lambda stargazer: stargazer.user_id in known_rows):
+                    if user is None:
+                        rows[stargazer.user_id] = known_rows[stargazer.user_id]  # Carried over from a previous snapshot
+                    else:
+                        identities.add_profile(stargazer.user_id, user)
+                        github_user_data.append(user)
+                        if linkedin_profile and linkedin_profile.name:  # Only add if we got a valid name
+                            linkedin_data[stargazer.user_id] = linkedin_profile
+                        else:
+                            linkedin_profile = None
+                        try:
+                            rows[stargazer.user_id] = build_row(user, linkedin_profile)
+                        except Exception as e:
+                            logger.error(f"Error building row for user: {user.name}: {str(e)}")
+                            rows[stargazer.user_id] = None
+                    if rows[stargazer.user_id] is not None:
+                        # Also fills in rows carried over from snapshots written before these columns existed
+                        rows[stargazer.user_id].update(locations.columns(rows[stargazer.user_id].get('location')))
+                    for tracked in tracked_repos:
+                        tracked.write_ready(rows)
+                completed = True
+            finally:
+                for tracked in tracked_repos:
+                    tracked.close(complete=completed)
+                locations.save()
+
+        for tracked in tracked_repos:
+            record_snapshot(tracked.url, tracked.sink.path, timestamp, tracked.sink.row_count)
+            logger.info(f"---\nTotal rows written to {tracked.sink.path}: {tracked.sink.row_count}")
+            if tracked.delta_sink:
+                record_snapshot(tracked.url, tracked.delta_sink.path, timestamp, tracked.delta_sink.row_count, delta=True)
+                logger.info(f"Total new stargazers written to {tracked.delta_sink.path}: {tracked.delta_sink.row_count}")
+
+        if len(tracked_repos) > 1:
+            membership_path = membership_filename(timestamp, extension=output_format)
+            with open_sink(membership_path, MEMBERSHIP_FIELD_NAMES, output_format) as membership_sink:
+                for tracked in tracked_repos:
+                    for stargazer in tracked.stargazers:
+                        membership_sink.write({'username': stargazer.user_id, 'repo_url': tracked.url,
+                                               'starred_at': stargazer.starred_at or ''})
+            logger.info(f"Total memberships written to {membership_path}: {membership_sink.row_count}")
+
+        logger.info(f"Scraped {sum(len(tracked.stargazers) for tracked in tracked_repos)} stargazers")
+        if len(tracked_repos) > 1:
+            logger.info(f"Found {identities.num_logins} unique users across {len(tracked_repos)} repos")
+        shared_identities = identities.shared_identities()
+        if shared_identities:
+            logger.info(f"Found {sum(len(logins) for logins in shared_identities)} logins sharing an email or LinkedIn "
+                        f"profile with another login, {len(identities)} distinct people in total")
+            for logins in shared_identities:
+                logger.debug(f"Same person: {', '.join(logins)}")
+        if incremental:
+            logger.info(f"Found {sum(len(tracked.new_stargazers) for tracked in tracked_repos)} new stargazers")
+        logger.info(f"Scraped GitHub data for {len(github_user_data)} users")
+        logger.info(f"Scraped LinkedIn data for {len(linkedin_data)} users")
+        if enricher.linkedin_coalesced:
+            logger.info(f"Shared {enricher.linkedin_coalesced} LinkedIn scrapes between users linking the same profile")
+        if enricher.linkedin_timeouts:
+            logger.info(f"Timed out on {enricher.linkedin_timeouts} LinkedIn profiles")
+
+        # Step 4 Print or process the collected data as needed
+        logger.debug("\nGitHub User Data:")
+        for user in github_user_data:
+            logger.debug(user)
+
+        if scrape_linkedin == True:
+            logger.debug("\nLinkedIn Data:")
+            for login, profile in linkedin_data.items():
+                logger.debug(f"{login}: {profile}")
+
+        logger.info("---\nScraping completed")
+
+
+        # Step 4 Memorize stargazers with Mem0
+        if use_mem0 == True:
+            with metrics.timed("stage", stage="mem0"):
+                memory_system = integrations["mem0"]()
+                for tracked in tracked_repos:
+                    added = memory_system.add_stargazers(
+                        tracked.url,
+                        [stargazer.user_id for stargazer in tracked.new_stargazers],
                         agent_id=agent_name,
-                        run_id=str(Time()),
-                        metadata={'app_id': repository},
+                        run_id=run_id,
+                        parallelism=mem0_parallelism,
                     )
+                    logger.info(f"Added {added} stargazers of {tracked.repo.name} to memory")
 
-    # Step 5 Combine data and write to CSV
-    print(f"Writing stargazers data to CSV. Number of GitHub users to write: {len(github_user_data)}")
-    # Create the 'data' directory if it doesn't exist
-    os.makedirs('data', exist_ok=True)
+        # Step 4a Load stargazers into the Neo4j knowledge graph. The (User)-[:STARRED]->(Repo) structure is
+        # already known, so it is written directly instead of going through Mem0's LLM graph extraction.
+        if use_neo4j_kg == True:
+            logger.info("Updating knowledge graph")
+            with metrics.timed("stage", stage="neo4j"):
+                graph_writer = integrations["neo4j"]()
+                try:
+                    for tracked in tracked_repos:
+                        written = graph_writer.upsert_stargazers(tracked.url, tracked.repo, tracked.graph_rows(rows))
+                        logger.info(f"Upserted {written} stargazers of {tracked.repo.name} into the knowledge graph")
+                finally:
+                    graph_writer.close()
 
-    csv_filename = f"data/Stargazers_of_{repo.description.replace(' ', '_')[:30]}__{str(Time())}.csv"
-    print(f"Saved file: {csv_filename}")
-    with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        field_names = ['username', 'email', 'name', 'location', 'github_followers', 'linkedin_headline', 'current_position',
-                      'linkedin_followers']
-        writer = csv.DictWriter(csvfile, fieldnames=field_names)
+        # Step 5 Add emails to mailchimp list
+        if use_mailchimp == True:
+            logger.info("Adding emails to Mailchimp list")
+            with metrics.timed("stage", stage="mailchimp"):
+                for tracked in tracked_repos:
+                    scraped_emails = tracked.emails(rows)
+                    tag_name = tracked.repo.name
 
-        writer.writeheader()
-        row_count = 0
-        for user in github_user_data:
-            try:
-                linkedin_profile = linkedin_data.get(user.name)
-                row = {
-                    'username': user.name,
-                    'email': user.email or (linkedin_profile.email if linkedin_profile else '') or '',
-                    'name': linkedin_profile.name if linkedin_profile else user.name,
-                    'location': linkedin_profile.location if linkedin_profile else (user.location or ''),
-                    'github_followers': user.num_followers,
-                    'linkedin_headline': getattr(linkedin_profile, 'headline', ''),
-                    'current_position': getattr(linkedin_profile, 'curr_job', ''),
-                    'linkedin_followers': getattr(linkedin_profile, 'num_followers', '')
-                }
-                writer.writerow(row)
-                row_count += 1
-                print(f"Writing row {row_count}: {row}")
-            except Exception as e:
-                print(f"Error writing CSV row for user: {user.name}: {str(e)}")
-
-    print(f"---\nTotal rows written to {csv_filename}: {row_count}")
-
-    # Step 6 Add emails to mailchimp list
-    if use_mailchimp == True:
-        print(f"Adding emails to Mailchimp list")
-        scraped_emails = [user.email for user in github_user_data if user.email]
-        tag_name = repo.name
-
-        if scraped_emails:
-            print(f"Processing {len(scraped_emails)} emails")
-            mailchimp_adapter.process_emails(scraped_emails, f"tag_{tag_name}")
-        else:
-            print("No emails found to process")
+                    if scraped_emails:
+                        logger.info(f"Processing {len(scraped_emails)} emails")
+                        failed_emails = mailchimp_adapter.process_emails(scraped_emails, f"tag_{tag_name}")
+                        logger.info(f"Added {len(scraped_emails) - len(failed_emails)} emails to Mailchimp, {len(failed_emails)} failed")
+                    else:
+                        logger.info(f"No emails found to process for {tracked.repo.name}")
+
+        logger.info(profile_cache.stats())
+        if multion_scraper:
+            logger.info(f"MultiOn sessions opened: {multion_scraper.session_pool.sessions_created}")
+            projection_summary = multion_scraper.projection_stats.summary()
+            if projection_summary:
+                logger.info(f"---\n{projection_summary}")
+        # The run completed, so there is nothing left to resume
+        journal.close(remove=True)
+
+        logger.info(f"---\n{rate_limiter.summary()}")
+        logger.info(f"---\n{metrics.summary()}")
+        if metrics_textfile:
+            metrics.write_prometheus(metrics_textfile)
+        if metrics_json:
+            metrics.write_json(metrics_json)
+    finally:
+        # Also closed when the run fails, so failed --watch cycles do not leak sessions and connections
+        if profile_cache is not None:
+            profile_cache.close()
+        if multion_scraper:
+            multion_scraper.close()
+        resilience.close()
+        if journal is not None:
+            journal.close()  # Kept when the run failed, so it can be resumed
+
+
+def star_count_scraper():
+    """The scraper --watch reads the current star count of the repos with, the cheap check done between runs."""
+    return GitHubAPIUtils() if os.environ.get("GITHUB_TOKEN") else MultiOnUtils(use_agentops=False)
+
+
+def read_repos_file(path):
+    """Read repository URLs from a file, one per line. Blank lines and lines starting with # are ignored."""
+    with open(path, encoding='utf-8') as repos_file:
+        return [line.strip() for line in repos_file if line.strip() and not line.strip().startswith('#')]
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scrape GitHub and LinkedIn data for repository stargazers.")
-    parser.add_argument("repo_url", help="URL of the GitHub repository to scrape")
+    parser.add_argument("repo_urls", nargs="*", metavar="repo_url", help="URLs of the GitHub repositories to scrape")
+    parser.add_argument("-f", "--repos-file",
+                        help="File with the URLs of the GitHub repositories to scrape, one per line")
     parser.add_argument("-limit","--max-stargazers", type=int, help="Maximum number of stargazers to scrape")
     parser.add_argument("-li","--with-linkedin", action="store_true", default=False,
                         help="Scrape LinkedIn profiles")
@@ -173,10 +458,93 @@ if __name__ == "__main__":
     parser.add_argument("-mailchimp", "--with-mailchimp", action="store_true", default=False,
                         help="Option to include adding scraped users to mailchimp list")
     parser.add_argument("-kg", "--with-neo4j-kg", action="store_true", default=False,
-                        help="Option to use Neo4j knowledge graph. Requires --with-mem0")
+                        help="Option to load stargazers into a Neo4j knowledge graph")
+    parser.add_argument("--mem0-parallelism", type=int, default=4,
+                        help="Number of facts added to Mem0 concurrently (default: 4)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of stargazers to scrape concurrently (default: 1)")
+    parser.add_argument("--refresh", action="store_true", default=False,
+                        help="Ignore cached profiles and scrape every user again")
+    parser.add_argument("--max-age", type=float, default=24,
+                        help="Maximum age in hours of a cached profile before it is scraped again (default: 24)")
+    parser.add_argument("--linkedin-max-steps", type=int, default=10,
+                        help="Maximum number of agent steps spent navigating to one LinkedIn profile (default: 10)")
+    parser.add_argument("--linkedin-timeout", type=float, default=120,
+                        help="Maximum number of seconds spent navigating to one LinkedIn profile (default: 120)")
+    parser.add_argument("-o", "--output-format", choices=list(SINKS), default="csv",
+                        help="Format of the output file (default: csv)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Resume an interrupted run, only scraping the users it did not finish")
+    parser.add_argument("-inc", "--incremental", action="store_true", default=False,
+                        help="Only scrape stargazers that are not in the latest snapshot of the repo")
+    parser.add_argument("--delta", action="store_true", default=False,
+                        help="Also write the new stargazers to a separate delta file. Requires --incremental or --watch")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="TARGET=RATE[:CONCURRENCY]",
+                        help="Maximum requests per second and concurrent requests of a target (github, linkedin, "
+                             "multion or github_api), e.g. linkedin=0.2:2. Can be repeated")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Number of times a scrape that failed with a transient error is retried (default: 2)")
+    parser.add_argument("--hedge", action="store_true", default=False,
+                        help="Start a second session for scrapes slower than the p95 latency and keep the first answer")
+    parser.add_argument("--columns", type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+                        help=f"Comma-separated output columns, out of {','.join(FIELD_NAMES)} (default: all). "
+                             "Profiles are only scraped for the fields they need")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="Logging verbosity, DEBUG also logs the raw scraped data (default: INFO)")
+    parser.add_argument("--metrics-textfile", default=METRICS_TEXTFILE,
+                        help=f"Prometheus textfile the metrics are written to after each run (default: {METRICS_TEXTFILE})")
+    parser.add_argument("--metrics-json", default=METRICS_JSON,
+                        help=f"JSON file the metrics are written to after each run (default: {METRICS_JSON})")
+    parser.add_argument("--watch", action="store_true", default=False,
+                        help="Keep running, and only scrape the new stargazers of repos whose star count changed")
+    parser.add_argument("--interval", type=float, default=3600,
+                        help="Seconds between two checks of a repo in --watch mode (default: 3600)")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="Random fraction of --interval added to or removed from each check (default: 0.1)")
 
     args = parser.parse_args()
-    if args.with_neo4j_kg and not args.with_mem0:
-        parser.error("--with-neo4j-kg requires --with-mem0 to be present")
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+    repo_urls = list(args.repo_urls)
+    if args.repos_file:
+        repo_urls += read_repos_file(args.repos_file)
+    repo_urls = list(dict.fromkeys(repo_urls))  # A repo listed twice is only tracked once
+    if not repo_urls:
+        parser.error("at least one repo_url or a --repos-file is required")
+    if args.delta and not (args.incremental or args.watch):
+        parser.error("--delta requires --incremental or --watch to be present")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+    if args.watch and args.resume:
+        parser.error("--resume cannot be used with --watch")
+    rate_limits = {}
+    for value in args.rate_limit:
+        try:
+            rate_limits.update(parse_rate_limit(value))
+        except ValueError as e:
+            parser.error(f"--rate-limit {value}: {str(e)}")
+    unknown_columns = [name for name in args.columns or [] if name not in FIELD_NAMES]
+    if unknown_columns:
+        parser.error(f"--columns: unknown columns {', '.join(unknown_columns)}")
+    if args.interval <= 0 or not 0 <= args.jitter < 1:
+        parser.error("--interval must be positive and --jitter between 0 and 1")
+
+    def run(urls, incremental):
+        main(urls, args.max_stargazers, args.with_linkedin, args.with_agentops, args.with_mem0, args.with_neo4j_kg, args.with_mailchimp, args.workers,
+             args.refresh, args.max_age, incremental, args.delta, args.linkedin_max_steps, args.linkedin_timeout,
+             args.output_format, args.resume, args.mem0_parallelism, args.metrics_textfile, args.metrics_json,
+             rate_limits, args.retries, args.hedge, args.columns)
 
-    main(args.repo_url, args.max_stargazers, args.with_linkedin, args.with_agentops, args.with_mem0, args.with_neo4j_kg, args.with_mailchimp)
+    if args.watch:
+        # Changed repos are always scraped incrementally, so only their new stargazers are enriched
+        probe_scraper = star_count_scraper()
+        watcher = RepoWatcher(repo_urls, probe=lambda repo_url: probe_scraper.scrape_repo(repo_url).num_stars,
+                              run=lambda urls: run(urls, incremental=True), interval=args.interval, jitter=args.jitter)
+        logger.info(f"Watching {len(repo_urls)} repos, checking each every {args.interval:.0f}s")
+        try:
+            watcher.watch()
+        finally:
+            probe_scraper.close()
+    else:
+        run(repo_urls, args.incremental)
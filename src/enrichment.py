@@ -0,0 +1,182 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from src.metrics import metrics
+from src.multion_utils import MultiOnUtils, StargazerData, GitHubUserData, LinkedInData
+from src.identity import SingleFlight, normalize_linkedin_url
+from src.journal import RunJournal
+from src.profile_cache import ProfileCache
+
+logger = logging.getLogger(__name__)
+
+
+class StargazerEnricher:
+    """
+    Enriches stargazers with GitHub and (optionally) LinkedIn profile data.
+
+    GitHub and LinkedIn scrapes are fanned out over a bounded thread pool. A user's
+    LinkedIn scrape is submitted as soon as their GitHub result arrives, so both phases
+    overlap. Results are yielded in the same order as the input stargazers, regardless
+    of the order in which the remote sessions finish, which keeps the output deterministic.
+
+    GitHub data comes from `scraper`, which looks up GITHUB_BATCH_SIZE users per call
+    (one for MultiOnUtils, 100 for GitHubAPIUtils). LinkedIn data comes from
+    `linkedin_scraper`, which defaults to `scraper`.
+
+    When a ProfileCache is given, profiles scraped recently enough are served from it
+    and no remote session is started for them. When a RunJournal is given, every result is
+    recorded in it, and results it already holds (from an interrupted run) are reused.
+
+    LinkedIn profiles are keyed by their normalized URL, and users linking the same profile
+    share one scrape of it, even when their lookups run at the same time.
+
+    A GitHub scrape that still fails after the scraper's retries fails the run, which can be
+    resumed from the journal. A failed LinkedIn scrape is logged and the user is yielded without
+    LinkedIn data.
+    """
+
+    def __init__(self, scraper, workers: int = 1, scrape_linkedin: bool = False,
+                 cache: Optional[ProfileCache] = None, linkedin_scraper: Optional[MultiOnUtils] = None,
+                 journal: Optional[RunJournal] = None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.scraper = scraper
+        self.linkedin_scraper = linkedin_scraper or scraper
+        self.batch_size = scraper.GITHUB_BATCH_SIZE
+        self.workers = workers
+        self.scrape_linkedin = scrape_linkedin
+        self.cache = cache
+        self.journal = journal
+        self.linkedin_timeouts = 0
+        self._linkedin_flights = SingleFlight()
+
+    @property
+    def linkedin_coalesced(self) -> int:
+        """Number of LinkedIn lookups that waited for the same profile's scrape instead of scraping it again"""
+        return self._linkedin_flights.coalesced
+
+    def enrich(self, stargazers: Iterable[StargazerData], skip: Optional[Callable[[StargazerData], bool]] = None
+               ) -> Iterator[Tuple[StargazerData, Optional[GitHubUserData], Optional[LinkedInData]]]:
+        """
+        Yield (stargazer, github_user, linkedin_profile) tuples in input order.
+
+        Stargazers for which skip(stargazer) is true are not scraped, and are yielded in their
+        place in the order with github_user set to None.
+        """
+        results: Dict[int, list] = {}
+        pending = {}
+        next_index = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            batch = []
+            for index, stargazer in enumerate(stargazers):
+                if skip and skip(stargazer):
+                    results[index] = [stargazer, None, None, True]
+                    next_index = yield from self._emit_ready(results, next_index)
+                    continue
+                results[index] = [stargazer, None, None, False]
+                batch.append(index)
+                if len(batch) < self.batch_size:
+                    continue
+                self._submit_github(executor, pending, results, batch)
+                batch = []
+                # Keep a bounded backlog so a long stargazer list does not queue everything up front
+                while len(pending) >= self.workers * 2:
+                    self._collect(executor, pending, results, block=True)
+                self._collect(executor, pending, results, block=False)
+                next_index = yield from self._emit_ready(results, next_index)
+
+            if batch:
+                self._submit_github(executor, pending, results, batch)
+            while pending:
+                self._collect(executor, pending, results, block=True)
+                next_index = yield from self._emit_ready(results, next_index)
+            # Skipped stargazers at the end of the input are ready without anything left to collect
+            yield from self._emit_ready(results, next_index)
+
+    def _submit_github(self, executor, pending, results, indices):
+        users = [results[index][0].user_id for index in indices]
+        pending[executor.submit(self._scrape_github, users)] = ("github", indices)
+
+    def _scrape_github(self, users):
+        found = {}
+        for user in users:
+            user_data = self.journal.get_github(user) if self.journal else None
+            source = "journal"
+            if user_data is None and self.cache:
+                user_data = self.cache.get_github(user)
+                source = "cache"
+                if user_data is not None and self.journal:
+                    self.journal.record_github(user, user_data)
+            if user_data is not None:
+                found[user] = user_data
+                metrics.increment("profiles", kind="github", source=source)
+        missing = [user for user in users if user not in found]
+        if missing:
+            metrics.increment("profiles", len(missing), kind="github", source="scrape")
+            for user, user_data in zip(missing, self.scraper.scrape_github_batch(missing)):
+                found[user] = user_data
+                if self.cache:
+                    self.cache.put_github(user, user_data)
+                if self.journal:
+                    self.journal.record_github(user, user_data)
+        return [found[user] for user in users]
+
+    def _scrape_linkedin(self, link):
+        return self._linkedin_flights.do(link, self._lookup_linkedin, link)
+
+    def _lookup_linkedin(self, link):
+        profile = self.journal.get_linkedin(link) if self.journal else None
+        if profile is not None:
+            metrics.increment("profiles", kind="linkedin", source="journal")
+            return profile
+        profile = self.cache.get_linkedin(link) if self.cache else None
+        source = "cache"
+        if profile is None:
+            profile = self.linkedin_scraper.scrape_linkedin(link)
+            source = "scrape"
+            if self.cache:
+                self.cache.put_linkedin(link, profile)
+        metrics.increment("profiles", kind="linkedin", source=source)
+        if self.journal:
+            self.journal.record_linkedin(link, profile)
+        return profile
+
+    def _collect(self, executor, pending, results, block):
+        if not pending:
+            return
+        done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, key = pending.pop(future)
+            if kind == "github":
+                for index, user_data in zip(key, future.result()):
+                    results[index][1] = user_data
+                    if self.scrape_linkedin and user_data.linkedin_url:
+                        linkedin_future = executor.submit(self._scrape_linkedin,
+                                                          normalize_linkedin_url(user_data.linkedin_url))
+                        pending[linkedin_future] = ("linkedin", index)
+                    else:
+                        results[index][3] = True
+            else:
+                try:
+                    linkedin_profile = future.result()
+                except Exception as e:
+                    # LinkedIn data is optional, so a failed profile (after retries) does not fail the run.
+                    # It is not cached or journaled, so the next run scrapes it again.
+                    logger.error(f"Error scraping LinkedIn profile {results[key][1].linkedin_url}: {str(e)}")
+                    metrics.increment("profile_errors", kind="linkedin")
+                    results[key][3] = True
+                    continue
+                if linkedin_profile.timed_out:
+                    self.linkedin_timeouts += 1
+                    metrics.increment("linkedin_timeouts")
+                results[key][2] = linkedin_profile
+                results[key][3] = True
+
+    def _emit_ready(self, results, next_index):
+        while next_index in results and results[next_index][3]:
+            stargazer, user_data, linkedin_profile, _ = results.pop(next_index)
+            yield stargazer, user_data, linkedin_profile
+            next_index += 1
+        return next_index
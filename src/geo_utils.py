@@ -0,0 +1,255 @@
+import bisect
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+GEOCODE_CACHE_PATH = os.path.join("data", "geocode_cache.json")
+
+# Columns added to every output row
+LOCATION_FIELD_NAMES = ['country', 'lat', 'lon']
+
+# Longest place name, in tokens, looked up in the phrase index
+MAX_PHRASE_TOKENS = 4
+# Shortest token completed with the prefix index, shorter ones match too many names
+MIN_PREFIX_LENGTH = 4
+
+SPECIFICITY = {"city": 3, "region": 2, "country": 1}
+
+
+@dataclass
+class Place:
+    name: str
+    kind: str  # city, region or country
+    country_code: str
+    region: str
+    lat: float
+    lon: float
+    rank: int  # Position in the gazetteer, more prominent places come first
+
+
+@dataclass
+class Location:
+    """A raw location string resolved to a place of the gazetteer."""
+    place: str
+    kind: str
+    country: str
+    country_code: str
+    lat: float
+    lon: float
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    """Split text into (raw, normalized) word tokens. Accents, dots and apostrophes are dropped, so U.S. is us."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[.'’]", "", text)
+    return [(token, token.lower()) for token in re.findall(r"[^\W_]+", text)]
+
+
+def _phrase(text: str) -> str:
+    return " ".join(normalized for _, normalized in _tokenize(text))
+
+
+class Gazetteer:
+    """
+    Offline index of the countries, regions and cities in gazetteer.csv.
+
+    Every name and alias of a place is a phrase key in a dict, and a sorted list of the keys
+    serves prefix lookups. Abbreviations (US state codes, ISO country codes, ...) are weak keys:
+    they only match a token written in capitals or ending the location, so "in" or "me" in a
+    sentence do not resolve to Indiana or Maine.
+
+    resolve() reads a location from left to right as "city, region, country": the last place
+    found decides the country (preferring a reading consistent with the places before it), and
+    the most specific place found in that country is returned.
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.places: List[Place] = []
+        self.countries: Dict[str, Place] = {}
+        self._phrases: Dict[str, List[Tuple[Place, bool]]] = {}
+
+        with open(path, "rb") as gazetteer_file:
+            content = gazetteer_file.read()
+        # Cached results are only valid for the gazetteer they were resolved with
+        self.version = hashlib.sha1(content).hexdigest()[:12]
+        for rank, row in enumerate(csv.DictReader(content.decode("utf-8").splitlines())):
+            place = Place(name=row["name"], kind=row["kind"], country_code=row["country_code"],
+                          region=row["region"], lat=float(row["lat"]), lon=float(row["lon"]), rank=rank)
+            self.places.append(place)
+            if place.kind == "country":
+                self.countries[place.country_code] = place
+            for name in [place.name] + [alias for alias in row["aliases"].split("|") if alias]:
+                self._add_phrase(_phrase(name), place, weak=False)
+            for abbreviation in [abbreviation for abbreviation in row["abbreviations"].split("|") if abbreviation]:
+                self._add_phrase(_phrase(abbreviation), place, weak=True)
+        self._sorted_phrases = sorted(self._phrases)
+
+    def resolve(self, raw: str) -> Optional[Location]:
+        tokens = _tokenize(raw or "")
+        spans = self._match(tokens) or self._match_prefixes(tokens)
+        if not spans:
+            return None
+
+        # The last place found decides the country, e.g. "CA" is California after San Francisco but
+        # Canada after Toronto
+        earlier_countries = {place.country_code for readings in spans[:-1] for place, _ in readings}
+        last_readings = [reading for reading in spans[-1] if reading[0].country_code in earlier_countries] or spans[-1]
+        country_code = min(last_readings, key=self._country_priority)[0].country_code
+
+        candidates = [(index, place, weak) for index, readings in enumerate(spans)
+                      for place, weak in readings if place.country_code == country_code]
+        regions = {place.name for _, place, _ in candidates if place.kind == "region"}
+        _, place, _ = min(candidates, key=lambda candidate: (
+            -SPECIFICITY[candidate[1].kind],
+            candidate[1].region not in regions,  # Portland, OR is Portland in Oregon
+            candidate[0],
+            candidate[2],
+            candidate[1].rank,
+        ))
+        country = self.countries.get(country_code)
+        return Location(place=place.name, kind=place.kind, country=country.name if country else "",
+                        country_code=country_code, lat=place.lat, lon=place.lon)
+
+    def _add_phrase(self, phrase: str, place: Place, weak: bool):
+        readings = self._phrases.setdefault(phrase, [])
+        if not any(known is place for known, _ in readings):
+            readings.append((place, weak))
+
+    def _match(self, tokens: List[Tuple[str, str]]) -> List[List[Tuple[Place, bool]]]:
+        """Readings of every place name found in tokens, matching the longest phrase first."""
+        spans = []
+        index = 0
+        while index < len(tokens):
+            for length in range(min(MAX_PHRASE_TOKENS, len(tokens) - index), 0, -1):
+                phrase = " ".join(normalized for _, normalized in tokens[index:index + length])
+                weak_allowed = length == 1 and (tokens[index][0].isupper() or index == len(tokens) - 1)
+                readings = [(place, weak) for place, weak in self._phrases.get(phrase, ()) if weak_allowed or not weak]
+                if readings:
+                    spans.append(readings)
+                    index += length
+                    break
+            else:
+                index += 1
+        return spans
+
+    def _match_prefixes(self, tokens: List[Tuple[str, str]]) -> List[List[Tuple[Place, bool]]]:
+        """Readings of truncated names, e.g. "Califor", when they complete to a single place."""
+        spans = []
+        for _, token in tokens:
+            if len(token) < MIN_PREFIX_LENGTH:
+                continue
+            places = {}
+            start = bisect.bisect_left(self._sorted_phrases, token)
+            for phrase in self._sorted_phrases[start:]:
+                if not phrase.startswith(token):
+                    break
+                for place, weak in self._phrases[phrase]:
+                    if not weak:
+                        places[id(place)] = place
+            if len(places) == 1:
+                spans.append([(place, False) for place in places.values()])
+        return spans
+
+    @staticmethod
+    def _country_priority(reading: Tuple[Place, bool]):
+        place, weak = reading
+        # A lone name is most likely a country, a lone abbreviation most likely a state or province
+        order = ("region", "country", "city") if weak else ("country", "region", "city")
+        return weak, order.index(place.kind), place.rank
+
+
+class LocationNormalizer:
+    """
+    Resolves raw location strings to a country and coordinates, memoized on disk.
+
+    Results are kept in a JSON file keyed by the raw string, so each distinct location is only
+    resolved once across runs. The cache is dropped when the gazetteer changes. Call save() to
+    write new results back.
+    """
+
+    def __init__(self, gazetteer: Optional[Gazetteer] = None, cache_path: Optional[str] = GEOCODE_CACHE_PATH):
+        self.gazetteer = gazetteer or Gazetteer()
+        self.cache_path = cache_path
+        self._cache: Dict[str, Optional[dict]] = {}
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+            if cached.get("version") == self.gazetteer.version:
+                self._cache = cached["locations"]
+
+    def normalize(self, raw: Optional[str]) -> Optional[Location]:
+        key = (raw or "").strip()
+        if not key:
+            return None
+        if key not in self._cache:
+            location = self.gazetteer.resolve(key)
+            self._cache[key] = asdict(location) if location else None
+            self._dirty = True
+        cached = self._cache[key]
+        return Location(**cached) if cached else None
+
+    def normalize_batch(self, values: Iterable[Optional[str]]) -> List[Optional[Location]]:
+        """Resolve a whole column, resolving each distinct value once."""
+        values = list(values)
+        resolved = {value: self.normalize(value) for value in dict.fromkeys(values)}
+        return [resolved[value] for value in values]
+
+    def columns(self, raw: Optional[str]) -> Dict[str, object]:
+        """The LOCATION_FIELD_NAMES columns of a raw location, empty when it could not be resolved."""
+        location = self.normalize(raw)
+        if location is None:
+            return {'country': '', 'lat': '', 'lon': ''}
+        return {'country': location.country, 'lat': location.lat, 'lon': location.lon}
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"version": self.gazetteer.version, "locations": self._cache}, cache_file)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
+def add_location_columns(path: str, normalizer: Optional[LocationNormalizer] = None) -> int:
+    """Add the LOCATION_FIELD_NAMES columns to an existing snapshot file. Returns the number of rows resolved."""
+    from src.sinks import open_sink, read_rows
+
+    normalizer = normalizer or LocationNormalizer()
+    rows = read_rows(path)
+    field_names = list(rows[0]) if rows else []
+    field_names += [field for field in LOCATION_FIELD_NAMES if field not in field_names]
+    locations = normalizer.normalize_batch(row.get('location') for row in rows)
+    output_format = os.path.splitext(path)[1].lstrip('.')
+    # The sink writes a partial file and only replaces the snapshot once it is complete
+    with open_sink(path, field_names, output_format) as sink:
+        for row, location in zip(rows, locations):
+            row.update({'country': location.country, 'lat': location.lat, 'lon': location.lon} if location
+                       else {'country': '', 'lat': '', 'lon': ''})
+            sink.write(row)
+    normalizer.save()
+    return sum(location is not None for location in locations)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add normalized country, lat and lon columns to snapshot files.")
+    parser.add_argument("paths", nargs="+", metavar="path", help="Snapshot files (CSV, JSONL or Parquet)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for snapshot_path in args.paths:
+        resolved = add_location_columns(snapshot_path)
+        logger.info(f"{snapshot_path}: resolved {resolved} locations")
@@ -0,0 +1,249 @@
+# https://docs.github.com/en/rest and https://docs.github.com/en/graphql
+# Used instead of MultiOn for GitHub data when GITHUB_TOKEN is set.
+
+import json
+import logging
+import os
+import re
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from src.metrics import metrics
+from src.multion_utils import RepoData, StargazerData, GitHubUserData, MultiOnUtils
+from src.rate_limit import RateLimiter
+from src.resilience import EmptyResponseError, Resilience
+
+logger = logging.getLogger(__name__)
+
+# Largest page size of the REST API, and number of users looked up per GraphQL query
+GITHUB_API_PAGE_SIZE = 100
+
+USER_FIELDS = """
+    login
+    name
+    location
+    email
+    bio
+    websiteUrl
+    twitterUsername
+    followers { totalCount }
+    socialAccounts(first: 10) { nodes { provider url } }
+"""
+
+# A LinkedIn profile URL in free text such as a bio, with or without the scheme
+LINKEDIN_PROFILE_URL = re.compile(r"(?:https?://)?(?:[\w-]+\.)?linkedin\.com/in/[^\s/?#)\]>,;]+", re.IGNORECASE)
+
+
+class GitHubAPIError(RuntimeError):
+    """A GitHub API request failed with an HTTP error, code is its status (used by is_retryable)."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+class GitHubAPIUtils:
+    """
+    Reads repository, stargazer and user data from the GitHub REST and GraphQL APIs.
+
+    Produces the same RepoData / StargazerData / GitHubUserData as MultiOnUtils, so it can
+    be used in its place. Users are looked up in batches of up to 100 per GraphQL query.
+    A LinkedIn URL is taken from the social accounts, the website or the bio of a user, and the
+    optional MultiOn fallback scraper only visits the profiles of users none of them had one for.
+
+    Every request goes through `resilience`, which retries rate limits, server and connection
+    errors, including those GraphQL reports in the errors of a successful response.
+
+    The API location can be changed with GITHUB_API_URL, e.g. to point at a local stub server.
+    """
+
+    GITHUB_BATCH_SIZE = GITHUB_API_PAGE_SIZE
+
+    def __init__(self, token: Optional[str] = None, fallback: Optional[MultiOnUtils] = None,
+                 api_url: Optional[str] = None, timeout: float = 30, rate_limiter: Optional[RateLimiter] = None,
+                 resilience: Optional[Resilience] = None):
+        self.token = token or os.environ.get("GITHUB_TOKEN")
+        if not self.token:
+            raise ValueError("GITHUB_TOKEN is not set in .env variables\nCreate a token at https://github.com/settings/tokens")
+        self.api_url = (api_url or os.environ.get("GITHUB_API_URL") or "https://api.github.com").rstrip("/")
+        self.fallback = fallback
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.resilience = resilience or Resilience()
+
+    def close(self):
+        self.resilience.close()
+
+    def scrape_repo(self, repo_url: str) -> RepoData:
+        data = self.resilience.call("github_api", "repo", self._request, f"/repos/{self._repo_path(repo_url)}")
+        return RepoData(
+            name=data.get("name", ""),
+            description=data.get("description") or "",
+            num_stars=data.get("stargazers_count", 0),
+        )
+
+    def scrape_stargazers(self, repo_url: str, max_stargazers: Optional[int] = None) -> List[StargazerData]:
+        return list(self.iter_stargazers(repo_url, max_stargazers))
+
+    def iter_stargazers(self, repo_url: str, max_stargazers: Optional[int] = None,
+                        known: Optional[List[str]] = None, num_stars: Optional[int] = None) -> Iterator[StargazerData]:
+        """
+        Yield stargazers (oldest first, with starred_at) page by page until max_stargazers is reached.
+
+        known lists the logins of an earlier listing of the repo in its order, e.g. the last
+        snapshot. New stars are appended to the end, so reading starts one page before the last
+        full page of known users, and the known users of the skipped pages are yielded first
+        (without starred_at). num_stars is not needed, the pages are read to the end.
+        """
+        page, items = 1, None
+        if known and max_stargazers is None:
+            page, items = self._resume_page(repo_url, known)
+            for login in known[:(page - 1) * GITHUB_API_PAGE_SIZE]:
+                yield StargazerData(user_id=login)
+        count = 0
+        while max_stargazers is None or count < max_stargazers:
+            if items is None:
+                items = self._stargazers_page(repo_url, page)
+            for item in items:
+                yield StargazerData(user_id=item["user"]["login"], starred_at=item.get("starred_at"))
+                count += 1
+                if max_stargazers is not None and count >= max_stargazers:
+                    break
+            if len(items) < GITHUB_API_PAGE_SIZE:
+                break
+            page += 1
+            items = None
+
+    def _resume_page(self, repo_url: str, known: List[str]) -> Tuple[int, Optional[List[dict]]]:
+        """
+        First stargazers page to read after an earlier listing of the known logins, with its items
+        if they were read. When the first user of that page is not where the earlier listing had
+        it (users unstarred since), every page is read again.
+        """
+        page = len(known) // GITHUB_API_PAGE_SIZE
+        if page <= 1:
+            return 1, None
+        items = self._stargazers_page(repo_url, page)
+        skipped = (page - 1) * GITHUB_API_PAGE_SIZE
+        if not items or items[0]["user"]["login"].lower() != known[skipped].lower():
+            logger.info(f"Stargazers of {repo_url} shifted since the last listing, reading every page")
+            return 1, None
+        logger.info(f"Skipping the first {skipped} stargazers of {repo_url}, they are known")
+        return page, items
+
+    def _stargazers_page(self, repo_url: str, page: int) -> List[dict]:
+        return self.resilience.call(
+            "github_api", "stargazers_page", self._request,
+            f"/repos/{self._repo_path(repo_url)}/stargazers",
+            params={"per_page": GITHUB_API_PAGE_SIZE, "page": page},
+            # Includes the time each user starred the repository
+            accept="application/vnd.github.star+json",
+        )
+
+    def scrape_github(self, user = "areibman") -> GitHubUserData:
+        return self.scrape_github_batch([user])[0]
+
+    def scrape_github_batch(self, users: List[str]) -> List[GitHubUserData]:
+        """Look up users with one GraphQL query per batch of 100. Results are in the order of users."""
+        results = []
+        missing = []  # Indices of users the API found without a LinkedIn URL
+        for start in range(0, len(users), GITHUB_API_PAGE_SIZE):
+            batch = users[start:start + GITHUB_API_PAGE_SIZE]
+            data = self.resilience.call("github_api", "github_users", self._query_users, batch)
+            for i, user in enumerate(batch):
+                user_data = self._to_user_data(user, data.get(f"u{i}") or {})
+                # Unknown users have no profile page to scrape
+                if data.get(f"u{i}") and not user_data.linkedin_url:
+                    missing.append(len(results))
+                results.append(user_data)
+
+        if self.fallback and missing:
+            with ThreadPoolExecutor(max_workers=self.fallback.pool_size) as executor:
+                for index, user_data in zip(missing, executor.map(self._fill_from_fallback,
+                                                                  [results[index] for index in missing])):
+                    results[index] = user_data
+        return results
+
+    def _query_users(self, batch: List[str]) -> dict:
+        query = "query {\n" + "\n".join(
+            f"  u{i}: user(login: {json.dumps(user)}) {{ {USER_FIELDS} }}" for i, user in enumerate(batch)
+        ) + "\n}"
+        response = self._request("/graphql", body={"query": query})
+        # Unknown logins come back as null together with a NOT_FOUND error, the other users are still
+        # returned. Any other error (RATE_LIMITED, timeouts, ...) may have left users or all the data out,
+        # so the query is retried instead of recording empty users.
+        errors = [error for error in response.get("errors") or [] if error.get("type") != "NOT_FOUND"]
+        if errors:
+            raise EmptyResponseError("GitHub GraphQL query failed: " + "; ".join(
+                f"{error.get('type', 'ERROR')}: {error.get('message', '')}" for error in errors[:3]))
+        return response.get("data") or {}
+
+    def _to_user_data(self, user: str, data: dict) -> GitHubUserData:
+        social_accounts = (data.get("socialAccounts") or {}).get("nodes") or []
+        linkedin_url = next((account["url"] for account in social_accounts if account.get("provider") == "LINKEDIN"), None)
+        if not linkedin_url:
+            # The website or bio of users who did not add LinkedIn as a social account
+            match = LINKEDIN_PROFILE_URL.search(data.get("websiteUrl") or "") or \
+                LINKEDIN_PROFILE_URL.search(data.get("bio") or "")
+            if match:
+                linkedin_url = match.group(0) if match.group(0).lower().startswith("http") else f"https://{match.group(0)}"
+        twitter_username = data.get("twitterUsername")
+
+        return GitHubUserData(
+            name=data.get("name") or "",
+            num_followers=(data.get("followers") or {}).get("totalCount", 0),
+            location=data.get("location") or "",
+            linkedin_url=linkedin_url,
+            twitter_url=f"https://twitter.com/{twitter_username}" if twitter_username else None,
+            email=data.get("email") or "",
+            username=data.get("login") or user,
+        )
+
+    def _fill_from_fallback(self, user_data: GitHubUserData) -> GitHubUserData:
+        try:
+            scraped = self.fallback.scrape_github(user_data.username)
+        except Exception as e:
+            # The API data is still written, only the LinkedIn URL is missing
+            logger.error(f"Fallback scrape of {user_data.username} failed, keeping the GitHub API data: {str(e)}")
+            return user_data
+        user_data.linkedin_url = scraped.linkedin_url
+        user_data.email = user_data.email or scraped.email
+        return user_data
+
+    def _request(self, path, params=None, body=None, accept="application/vnd.github+json"):
+        url = f"{self.api_url}{path}"
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(body).encode("utf-8") if body is not None else None,
+            headers={
+                "Accept": accept,
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json",
+                "User-Agent": "startrack",
+            },
+            method="POST" if body is not None else "GET",
+        )
+        try:
+            with self.rate_limiter.slot("github_api"), \
+                    metrics.timed("github_api_request", endpoint="graphql" if path == "/graphql" else "rest"):
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            raise GitHubAPIError(f"GitHub API request {path} failed with {e.code}: {e.read().decode('utf-8', 'replace')}",
+                                 e.code) from e
+        except (urllib.error.URLError, TimeoutError, OSError) as e:
+            # DNS failures, refused or reset connections and timeouts, all transient
+            raise ConnectionError(f"GitHub API request {path} failed: {str(e)}") from e
+
+    def _repo_path(self, repo_url: str) -> str:
+        # https://github.com/owner/repo(.git)(/) -> owner/repo
+        parts = urllib.parse.urlparse(repo_url).path.strip("/").split("/")
+        if len(parts) < 2:
+            raise ValueError(f"Not a GitHub repository URL: {repo_url}")
+        owner, repo = parts[0], parts[1]
+        return f"{owner}/{repo[:-len('.git')] if repo.endswith('.git') else repo}"
@@ -0,0 +1,162 @@
+import threading
+import urllib.parse
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from src.multion_utils import GitHubUserData, StargazerData
+
+T = TypeVar("T")
+
+
+def normalize_login(login: str) -> str:
+    # GitHub logins are case-insensitive
+    return login.strip().lower()
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercase an email and drop its +tag, and the dots of a Gmail address. None if it is not an email."""
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local and domain else None
+
+
+def normalize_linkedin_url(url: Optional[str]) -> Optional[str]:
+    """
+    Canonical form of a LinkedIn profile URL, https://www.linkedin.com/in/<slug>.
+
+    Country subdomains, the scheme, query strings and trailing slashes are dropped, so every
+    spelling of a profile URL maps to the same key. URLs that are not LinkedIn profiles are
+    returned stripped but otherwise unchanged.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    parsed = urllib.parse.urlparse(url if "://" in url else f"https://{url}")
+    path = [part for part in parsed.path.split("/") if part]
+    if not parsed.netloc.lower().endswith("linkedin.com") or len(path) < 2 or path[0].lower() != "in":
+        return url
+    return f"https://www.linkedin.com/in/{path[1].lower()}"
+
+
+class IdentityIndex:
+    """
+    Resolves stargazer logins to people, so each login is scraped once and people are counted once.
+
+    Every login, normalized email and normalized LinkedIn URL is a key, and keys known to
+    belong to the same person are merged (union-find). Stargazers are deduped on their login
+    before enrichment with add_stargazer(). Once a user's GitHub profile is known, add_profile()
+    links their login to their email and LinkedIn URL, so two accounts of one person resolve
+    to the same identity.
+    """
+
+    def __init__(self):
+        self._logins: Dict[str, str] = {}  # Normalized login -> first spelling seen
+        self._parents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add_stargazer(self, stargazer: StargazerData) -> bool:
+        """
+        Register a stargazer and return whether their login is new.
+
+        The stargazer's user_id is replaced by the first spelling seen of their login, so the
+        same account listed with different casing maps to the same row.
+        """
+        key = normalize_login(stargazer.user_id)
+        with self._lock:
+            known = self._logins.get(key)
+            if known is not None:
+                stargazer.user_id = known
+                return False
+            self._logins[key] = stargazer.user_id
+            self._find(f"login:{key}")
+            return True
+
+    def add_profile(self, login: str, user: GitHubUserData):
+        """Link a login to the email and LinkedIn URL of its GitHub profile."""
+        login_key = f"login:{normalize_login(login)}"
+        email = normalize_email(user.email)
+        linkedin_url = normalize_linkedin_url(user.linkedin_url)
+        with self._lock:
+            if email:
+                self._union(login_key, f"email:{email}")
+            if linkedin_url:
+                self._union(login_key, f"linkedin:{linkedin_url}")
+
+    def same_person(self, login: str, other_login: str) -> bool:
+        with self._lock:
+            return self._find(f"login:{normalize_login(login)}") == self._find(f"login:{normalize_login(other_login)}")
+
+    def shared_identities(self) -> List[List[str]]:
+        """Logins grouped by person, for every person with more than one login. Sorted, so deterministic."""
+        with self._lock:
+            groups: Dict[str, List[str]] = {}
+            for key, login in self._logins.items():
+                groups.setdefault(self._find(f"login:{key}"), []).append(login)
+        return sorted(sorted(logins) for logins in groups.values() if len(logins) > 1)
+
+    @property
+    def num_logins(self) -> int:
+        return len(self._logins)
+
+    def __len__(self):
+        """Number of distinct people among the registered logins"""
+        with self._lock:
+            return len({self._find(f"login:{key}") for key in self._logins})
+
+    def _find(self, key: str) -> str:
+        # Called with the lock held
+        root = self._parents.setdefault(key, key)
+        while root != self._parents[root]:
+            root = self._parents[root]
+        while key != root:
+            key, self._parents[key] = self._parents[key], root
+        return root
+
+    def _union(self, key: str, other_key: str):
+        root, other_root = self._find(key), self._find(other_key)
+        if root != other_root:
+            # The smaller key becomes the root, so the result does not depend on the order of the unions
+            root, other_root = sorted((root, other_root))
+            self._parents[other_root] = root
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one.
+
+    While do(key, fn) runs, other threads calling do() with the same key wait for it and get
+    its result (or its exception) instead of calling fn again. Results are not kept once the
+    call finished; caching them is up to fn.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -0,0 +1,30 @@
+import importlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Integration:
+    """An optional integration: the class implementing it, and the package and flag it needs."""
+    module: str
+    attribute: str
+    package: str
+    flag: str
+
+
+# Integrations are only imported when their flag is set, as their client libraries are slow to import
+INTEGRATIONS = {
+    "mailchimp": Integration(module="src.mailchimp_adapter", attribute="MailchimpAdapter", package="mailchimp3",
+                             flag="--with-mailchimp"),
+    "mem0": Integration(module="src.mem0_utils", attribute="MemorySystem", package="mem0ai", flag="--with-mem0"),
+    "neo4j": Integration(module="src.neo4j_utils", attribute="GraphWriter", package="neo4j", flag="--with-neo4j-kg"),
+}
+
+
+def load_integration(name: str) -> type:
+    """Import an integration by name and return its class, e.g. load_integration("mem0")()"""
+    integration = INTEGRATIONS[name]
+    try:
+        module = importlib.import_module(integration.module)
+    except ImportError as e:
+        raise ImportError(f"{integration.flag} requires {integration.package}: pip install {integration.package}") from e
+    return getattr(module, integration.attribute)
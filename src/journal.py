@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from dataclasses import asdict
+from typing import Optional
+
+from src.multion_utils import GitHubUserData, LinkedInData
+
+JOURNAL_DIR = os.path.join("data", "runs")
+
+
+class RunJournal:
+    """
+    Append-only journal of the profiles scraped during one run.
+
+    Every completed scrape_github / scrape_linkedin result is appended as one JSON line,
+    tagged with the repository and the GitHub username or LinkedIn URL it belongs to, and
+    fsync'd before the call returns. Opening the journal of an existing run replays it, so
+    a resumed run only scrapes the users that were not finished. A line cut short by a killed
+    process is dropped when the journal is reopened.
+    """
+
+    def __init__(self, run_id: str, repo_url: str, directory: str = JOURNAL_DIR, resume: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.run_id = run_id
+        self.repo_url = repo_url
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self._github = {}
+        self._linkedin = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            if not os.path.exists(self.path):
+                raise ValueError(f"No journal found for run {run_id} at {self.path}")
+            self._replay()
+        elif os.path.exists(self.path):
+            raise ValueError(f"A journal for run {run_id} already exists at {self.path}, use --resume {run_id}")
+
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if not resume:
+            self._append({"kind": "run", "repo": repo_url})
+
+    @property
+    def replayed(self) -> int:
+        return len(self._github) + len(self._linkedin)
+
+    def get_github(self, user: str) -> Optional[GitHubUserData]:
+        return self._github.get(user)
+
+    def record_github(self, user: str, user_data: GitHubUserData):
+        self._github[user] = user_data
+        self._append({"kind": "github", "repo": self.repo_url, "key": user, "data": asdict(user_data)})
+
+    def get_linkedin(self, link: str) -> Optional[LinkedInData]:
+        return self._linkedin.get(link)
+
+    def record_linkedin(self, link: str, profile: LinkedInData):
+        # Timed out profiles are not finished, a resumed run should try them again
+        if profile.timed_out:
+            return
+        self._linkedin[link] = profile
+        self._append({"kind": "linkedin", "repo": self.repo_url, "key": link, "data": asdict(profile)})
+
+    def close(self, remove: bool = False):
+        """Close the journal. With remove=True the journal is deleted, e.g. once the run completed."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _append(self, record: dict):
+        # A single write() of one line on an O_APPEND descriptor, then fsync, so records are never interleaved
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._lock:
+            os.write(self._fd, line)
+            os.fsync(self._fd)
+
+    def _replay(self):
+        with open(self.path, "rb") as journal_file:
+            content = journal_file.read()
+
+        # Drop a trailing partial line left by a killed process before appending to the file again
+        complete = content[:content.rfind(b"\n") + 1]
+        if len(complete) != len(content):
+            with open(self.path, "r+b") as journal_file:
+                journal_file.truncate(len(complete))
+
+        for line in complete.decode("utf-8").splitlines():
+            record = json.loads(line)
+            if record["kind"] == "run":
+                if record["repo"] != self.repo_url:
+                    raise ValueError(f"Run {self.run_id} was started for {record['repo']}, not {self.repo_url}")
+            elif record["kind"] == "github":
+                self._github[record["key"]] = GitHubUserData(**record["data"])
+            elif record["kind"] == "linkedin":
+                self._linkedin[record["key"]] = LinkedInData(**record["data"])
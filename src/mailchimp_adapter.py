@@ -1,14 +1,20 @@
 import os
+import json
 import logging
 from dotenv import load_dotenv
 from mailchimp3 import MailChimp
 from mailchimp3.mailchimpclient import MailChimpError
 
-logging.basicConfig(level=logging.INFO)
+from src.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Largest number of members the batch subscribe and static segment endpoints accept per request
+MAILCHIMP_BATCH_SIZE = 500
+TAG_CACHE_PATH = os.path.join("data", "mailchimp_tags.json")
+
 class MailchimpAdapter:
     """
     Adapter for interacting with Mailchimp API v3.
@@ -19,42 +25,122 @@ class MailchimpAdapter:
 
     def __init__(self):
         self.mailchimp_user_id = os.environ.get("MAILCHIMP_USER_ID")
-        print(self.mailchimp_user_id)
         self.mailchimp_api_key = os.environ.get("MAILCHIMP_API_KEY")
-        print(self.mailchimp_api_key)
         self.list_id = os.environ.get("MAILCHIMP_LIST_ID")  # This corresponds to the AUDIENCE_ID in the Mailchimp GUI
         if not self.mailchimp_user_id or not self.mailchimp_api_key or not self.list_id:
             raise ValueError(
                 "MAILCHIMP_USER_ID and MAILCHIMP_API_KEY and MAILCHIMP_LIST_ID must be set in environment variables")
 
         self.client = MailChimp(mc_api=self.mailchimp_api_key, mc_user=self.mailchimp_user_id)
+        # Point the client at another server, e.g. a local fake Mailchimp for testing
+        if os.environ.get("MAILCHIMP_API_URL"):
+            self.client.base_url = os.environ["MAILCHIMP_API_URL"].rstrip("/") + "/"
+        self.tag_cache_path = TAG_CACHE_PATH
+        self._tag_ids = self._load_tag_cache()
 
     def process_emails(self, emails, tag_name):
-        """Process a list of emails and add them to a specified tag."""
+        """
+        Add a list of emails to the list and to a specified tag, in bulk.
+
+        Members are upserted with the batch subscribe endpoint and added to the tag with one
+        members_to_add request per chunk of up to 500 emails.
+        Returns a dict of the emails that failed, mapped to the error Mailchimp reported.
+        """
         tag_id = self.ensure_tag(tag_name)
         if not tag_id:
             raise Exception(f"Failed to ensure '{tag_name}' tag")
 
-        for email in emails:
-            self.add_contact(email, tag_id, tag_name)
+        emails = list(dict.fromkeys(emails))
+        failed = {}
+        for start in range(0, len(emails), MAILCHIMP_BATCH_SIZE):
+            chunk = emails[start:start + MAILCHIMP_BATCH_SIZE]
+            chunk_failed = self.add_contacts_to_list(chunk)
+            failed.update(chunk_failed)
+
+            members = [email for email in chunk if email not in chunk_failed]
+            if members:
+                tag_failed = self.add_contacts_to_tag(members, tag_id, tag_name)
+                if tag_failed is None:
+                    # The cached tag no longer exists in Mailchimp, look it up again and retry once
+                    self._forget_tag(tag_name)
+                    tag_id = self.ensure_tag(tag_name)
+                    tag_failed = self.add_contacts_to_tag(members, tag_id, tag_name) if tag_id else None
+                if tag_failed is None:
+                    tag_failed = {email: f"Could not add to the '{tag_name}' tag" for email in members}
+                failed.update(tag_failed)
+
+        logger.info(f"Added {len(emails) - len(failed)} of {len(emails)} contacts to the '{tag_name}' tag")
+        for email, error in failed.items():
+            logger.error(f"Failed to add {email}: {error}")
+        return failed
+
+    def add_contacts_to_list(self, emails):
+        """Upsert up to 500 contacts with one batch subscribe request. Returns {email: error} for failures."""
+        try:
+            logger.info(f"Adding {len(emails)} contacts to list id {self.list_id}")
+            with metrics.timed("mailchimp_request", operation="update_members"):
+                response = self.client.lists.update_members(self.list_id, {
+                    'members': [{'email_address': email, 'status_if_new': 'subscribed'} for email in emails],
+                    'update_existing': True
+                })
+        except Exception as e:
+            logger.error(f"MailChimp API error adding contacts to list: {str(e)}")
+            return {email: str(e) for email in emails}
+
+        failed = {}
+        for error in response.get('errors', []):
+            failed[error.get('email_address', '')] = error.get('error', 'Unknown error')
+        return failed
+
+    def add_contacts_to_tag(self, emails, tag_id, tag_name):
+        """
+        Add up to 500 contacts to a tag with one members_to_add request.
+        Returns {email: error} for failures, or None if the tag no longer exists.
+        """
+        try:
+            logger.info(f"Adding {len(emails)} contacts to the tag {tag_id}")
+            with metrics.timed("mailchimp_request", operation="update_segment_members"):
+                response = self.client.lists.segments.update_members(self.list_id, tag_id, {
+                    'members_to_add': emails
+                })
+        except Exception as e:
+            error = e.args[0] if isinstance(e, MailChimpError) and e.args and isinstance(e.args[0], dict) else {}
+            if error.get('status') == 404:
+                logger.warning(f"The '{tag_name}' tag {tag_id} no longer exists")
+                return None
+            logger.error(f"MailChimp API error adding contacts to tag '{tag_name}': {str(e)}")
+            return {email: str(e) for email in emails}
+
+        failed = {}
+        for error in response.get('errors', []):
+            for email in error.get('email_addresses', []):
+                failed[email] = error.get('error', 'Unknown error')
+        return failed
 
     def ensure_tag(self, tag_name):
-        """Ensure a tag exists, creating it if necessary."""
+        """Ensure a tag exists, creating it if necessary. Tag ids are cached on disk per list."""
+        if tag_name in self._tag_ids:
+            return self._tag_ids[tag_name]
         try:
             logger.info(f"Checking for '{tag_name}' tag")
-            segments = self.client.lists.segments.all(self.list_id, get_all=True)
+            with metrics.timed("mailchimp_request", operation="list_segments"):
+                segments = self.client.lists.segments.all(self.list_id, get_all=True, type='static',
+                                                          fields='segments.id,segments.name')
 
             segment = next((seg for seg in segments['segments'] if seg['name'] == tag_name), None)
 
             if not segment:
                 logger.info(f"Creating '{tag_name}' tag")
-                segment = self.client.lists.segments.create(self.list_id, {
-                    'name': tag_name,
-                    'static_segment': []
-                })
+                with metrics.timed("mailchimp_request", operation="create_segment"):
+                    segment = self.client.lists.segments.create(self.list_id, {
+                        'name': tag_name,
+                        'static_segment': []
+                    })
 
             tag_id = segment['id']
             logger.info(f"Successfully ensured '{tag_name}' tag exists with ID: {tag_id}")
+            self._tag_ids[tag_name] = tag_id
+            self._save_tag_cache()
             return tag_id
         except MailChimpError as e:
             logger.error(f"MailChimp API error: {str(e)}")
@@ -67,10 +153,11 @@ class MailchimpAdapter:
         """Add a contact to the Mailchimp list."""
         try:
             logger.info(f"Adding contact: {email} to list id {self.list_id}")
-            member = self.client.lists.members.create_or_update(self.list_id, email, {
-                'email_address': email,
-                'status_if_new': 'subscribed'
-            })
+            with metrics.timed("mailchimp_request", operation="create_or_update_member"):
+                member = self.client.lists.members.create_or_update(self.list_id, email, {
+                    'email_address': email,
+                    'status_if_new': 'subscribed'
+                })
             logger.info(f"Successfully added {email} to the list.")
             return member
         except MailChimpError as e:
@@ -84,10 +171,11 @@ class MailchimpAdapter:
         """Add a contact to a specific tag."""
         try:
             logger.info(f"Adding contact: {email} to the tag {tag_id}")
-            self.client.lists.segments.members.create(self.list_id, tag_id, {
-                'email_address': email,
-                'status': 'subscribed'
-            })
+            with metrics.timed("mailchimp_request", operation="create_segment_member"):
+                self.client.lists.segments.members.create(self.list_id, tag_id, {
+                    'email_address': email,
+                    'status': 'subscribed'
+                })
             logger.info(f"Successfully added {email} to the '{tag_name}' tag.")
             return True
         except MailChimpError as e:
@@ -102,4 +190,24 @@ class MailchimpAdapter:
         member = self.add_contact_to_list(email)
         if member:
             return self.add_contact_to_tag(email, tag_id, tag_name)
-        return False
\ No newline at end of file
+        return False
+
+    def _load_tag_cache(self):
+        if not os.path.exists(self.tag_cache_path):
+            return {}
+        with open(self.tag_cache_path, encoding='utf-8') as cache_file:
+            return json.load(cache_file).get(self.list_id, {})
+
+    def _save_tag_cache(self):
+        cache = {}
+        if os.path.exists(self.tag_cache_path):
+            with open(self.tag_cache_path, encoding='utf-8') as cache_file:
+                cache = json.load(cache_file)
+        cache[self.list_id] = self._tag_ids
+        os.makedirs(os.path.dirname(self.tag_cache_path), exist_ok=True)
+        with open(self.tag_cache_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(cache, cache_file, indent=2)
+
+    def _forget_tag(self, tag_name):
+        self._tag_ids.pop(tag_name, None)
+        self._save_tag_cache()
@@ -1,12 +1,66 @@
 # https://docs.mem0.ai/platform/quickstart
 
+import logging
 import os
-from mem0 import MemoryClient
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
 from mem0 import Memory
 
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LEDGER_PATH = os.path.join("data", "mem0_ledger.sqlite")
+
+
+class MemoryLedger:
+    """Local record of the (repository, user) facts already added to Mem0, so reruns skip them."""
+
+    def __init__(self, path: str = LEDGER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stargazers ("
+            " repository TEXT NOT NULL,"
+            " user_id TEXT NOT NULL,"
+            " added_at REAL NOT NULL,"
+            " PRIMARY KEY (repository, user_id))"
+        )
+        self._conn.commit()
+
+    def missing(self, repository: str, user_ids: List[str]) -> List[str]:
+        with self._lock:
+            known = {row[0] for row in self._conn.execute(
+                "SELECT user_id FROM stargazers WHERE repository = ?", (repository,))}
+        return [user_id for user_id in dict.fromkeys(user_ids) if user_id not in known]
+
+    def record(self, repository: str, user_ids: List[str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stargazers (repository, user_id, added_at) VALUES (?, ?, ?)",
+                [(repository, user_id, time.time()) for user_id in user_ids],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 
 class MemorySystem:
-    def __init__(self):
+    """
+    Memorizes stargazers in Mem0's vector store.
+
+    The (User)-[:STARRED]->(Repo) graph is written by GraphWriter, so Mem0's graph store is off by
+    default: it would run an LLM graph extraction for every fact and duplicate those nodes. With
+    graph_store=True it is configured with the Neo4j settings, which are only read then.
+    """
+
+    def __init__(self, graph_store: bool = False):
         self.mem0_api_key = os.environ.get("MEM0_API_KEY")
         if not self.mem0_api_key:
             raise ValueError("MEM0_API_KEY is not set in .env variables\nGet your API key from https://app.mem0.ai/dashboard/api-keys")
@@ -14,25 +68,77 @@ class MemorySystem:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY is not set in .env variables\nGet your API key from https://platform.openai.com/api-keys")
 
-        self.neo4j_uri = os.environ.get("NEO4J_URI")
-        self.neo4j_username = os.environ.get("NEO4J_USERNAME")
-        self.neo4j_password = os.environ.get("NEO4J_PASSWORD")
-        if not self.neo4j_uri or not self.neo4j_username or not self.neo4j_password:
-            raise ValueError("Please set up your Auradb credentials on https://neo4j.com/product/auradb/")
-
-        client = MemoryClient(api_key=self.mem0_api_key)
         self.config = {
-            f"graph_store": {
+            "version": "v1.1"
+        }
+        if graph_store:
+            from src.neo4j_utils import load_neo4j_settings
+
+            self.neo4j_uri, self.neo4j_username, self.neo4j_password = load_neo4j_settings()
+            self.config["graph_store"] = {
                 "provider": "neo4j",
                 "config": {
                     "url": f"{self.neo4j_uri}",
                     "username": f"{self.neo4j_username}",
                     "password": f"{self.neo4j_password}"
                 }
-            },
-            "version": "v1.1"
-        }
+            }
+
+        self._memory = None
+        self._memory_lock = threading.Lock()
 
     def get_memory(self):
-        m = Memory.from_config(config_dict=self.config)
-        return m
\ No newline at end of file
+        # Building a Memory sets up the LLM and its stores, so it is done once and shared
+        with self._memory_lock:
+            if self._memory is None:
+                self._memory = Memory.from_config(config_dict=self.config)
+            return self._memory
+
+    def add_stargazers(self, repository: str, user_ids: List[str], agent_id: str, run_id: str,
+                       parallelism: int = 4, batch_size: int = 50, ledger: MemoryLedger = None) -> int:
+        """
+        Memorize that each user starred the repository, skipping users already in the ledger.
+
+        Facts are submitted in batches of batch_size, with up to `parallelism` memory.add calls
+        in flight at once. Successful facts are recorded in the ledger after each batch, so an
+        interrupted ingestion does not redo them. Returns the number of facts added.
+        """
+        own_ledger = ledger is None
+        ledger = ledger or MemoryLedger()
+        try:
+            user_ids = ledger.missing(repository, user_ids)
+            logger.info(f"Adding {len(user_ids)} new stargazers of {repository} to memory")
+            memory = self.get_memory()
+            added = 0
+
+            with ThreadPoolExecutor(max_workers=parallelism) as executor:
+                for start in range(0, len(user_ids), batch_size):
+                    futures = {
+                        executor.submit(
+                            self._add_fact,
+                            memory,
+                            f"The github user: {user_id} starred the repository: {repository}",
+                            user_id=user_id,
+                            agent_id=agent_id,
+                            run_id=run_id,
+                            metadata={'app_id': repository},
+                        ): user_id
+                        for user_id in user_ids[start:start + batch_size]
+                    }
+                    succeeded = []
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                            succeeded.append(futures[future])
+                        except Exception as e:
+                            logger.error(f"Failed to add stargazer {futures[future]} to memory: {str(e)}")
+                    ledger.record(repository, succeeded)
+                    added += len(succeeded)
+            return added
+        finally:
+            if own_ledger:
+                ledger.close()
+
+    def _add_fact(self, memory, fact: str, **kwargs):
+        with metrics.timed("mem0_add"):
+            return memory.add(fact, **kwargs)
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+METRICS_PREFIX = "startrack"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, plus the running count, sum and max."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket, like Prometheus' histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+
+class Metrics:
+    """
+    Counters and latency histograms of one process, keyed by metric name and labels.
+
+    Remote calls are wrapped in timed(name, **labels), which records their latency and counts
+    the ones that raised as <name>_errors. Metrics can be rendered as a summary table, or
+    written as a Prometheus textfile (for node_exporter's textfile collector) or as JSON.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def summary(self) -> str:
+        """Render every histogram and counter as a plain text table."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = [f"{'metric':<50} {'count':>8} {'errors':>7} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'total s':>9}"]
+        for (name, labels), histogram in histograms:
+            errors = self.counter(f"{name}_errors", **dict(labels))
+            lines.append(
+                f"{_series_name(name, labels):<50} {histogram.count:>8} {errors:>7.0f} {histogram.quantile(0.5):>8.3f} "
+                f"{histogram.quantile(0.95):>8.3f} {histogram.max:>8.3f} {histogram.sum:>9.2f}"
+            )
+        for (name, labels), value in counters:
+            if not name.endswith("_errors"):
+                lines.append(f"{_series_name(name, labels):<50} {value:>8.0f}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "max": round(histogram.max, 6),
+                        "p50": round(histogram.quantile(0.5), 6),
+                        "p95": round(histogram.quantile(0.95), 6),
+                        "buckets": dict(zip([str(bound) for bound in histogram.buckets] + ["+Inf"],
+                                            histogram.bucket_counts)),
+                    }
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def write_json(self, path: str):
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str):
+        """Write the metrics in the Prometheus text format, replacing the file atomically."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+
+        lines = []
+        previous_name = None
+        for (name, labels), value in counters:
+            metric = f"{METRICS_PREFIX}_{name}_total"
+            if name != previous_name:
+                lines.append(f"# TYPE {metric} counter")
+                previous_name = name
+            lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+        previous_name = None
+        for (name, labels), histogram in histograms:
+            metric = f"{METRICS_PREFIX}_{name}_seconds"
+            if name != previous_name:
+                lines.append(f"# TYPE {metric} histogram")
+                previous_name = name
+            cumulative = 0
+            for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], histogram.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_prometheus_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {histogram.count}")
+        _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def _series_name(name: str, labels: tuple) -> str:
+    return name + ("{" + ",".join(f"{key}={value}" for key, value in labels) + "}" if labels else "")
+
+
+def _prometheus_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _write_atomically(path: str, content: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(content)
+    os.replace(tmp_path, path)
+
+
+# Shared by every module of a run
+metrics = Metrics()
@@ -1,12 +1,40 @@
 # https://docs.multion.ai
 # Make sure that the MultiOn Chrome Extension is installed and enabled (for more details, see here).
 
+import logging
 import os
 import re
-from multion.client import MultiOn
-from typing import List, Dict, Optional
+import time
+from typing import Callable, Iterator, List, Dict, Optional
 from dataclasses import dataclass
 
+from src.metrics import metrics
+from src.projection import (GITHUB_FIELDS_BY_COLUMN, LINKEDIN_FIELDS_BY_COLUMN, TIERS, FieldProjection, ProjectionStats,
+                            build_projections)
+from src.rate_limit import RateLimiter
+from src.resilience import EmptyResponseError, Resilience
+from src.session_pool import SessionPool, PooledSession
+
+logger = logging.getLogger(__name__)
+
+# GitHub lists this many users per stargazers page
+STARGAZERS_PER_PAGE = 48
+
+# States of the LinkedIn navigation in scrape_linkedin
+LINKEDIN_DIRECT = "direct"
+LINKEDIN_NAVIGATE = "navigate"
+LINKEDIN_RETRIEVE = "retrieve"
+LINKEDIN_DONE = "done"
+LINKEDIN_TIMED_OUT = "timed_out"
+LINKEDIN_BACKOFF_SECONDS = 1
+LINKEDIN_MAX_BACKOFF_SECONDS = 8
+
+
+def create_multion_client(**kwargs):
+    # The MultiOn SDK (and AgentOps with it) takes a while to import, so it is only imported once a client is needed
+    from multion.client import MultiOn
+    return MultiOn(**kwargs)
+
 @dataclass
 class RepoData:
     name: str
@@ -16,6 +44,7 @@ class RepoData:
 @dataclass
 class StargazerData:
     user_id: str
+    starred_at: Optional[str] = None
 
 @dataclass
 class GitHubUserData:
@@ -25,6 +54,7 @@ class GitHubUserData:
     linkedin_url: Optional[str]
     twitter_url: Optional[str]
     email: Optional[str]
+    username: Optional[str] = None
 
 @dataclass
 class LinkedInData:
@@ -34,10 +64,30 @@ class LinkedInData:
     num_followers: int
     headline: str
     email: Optional[str]
+    timed_out: bool = False
 
 
 class MultiOnUtils:
-    def __init__(self, use_agentops: bool = False):
+    """
+    Scrapes GitHub and LinkedIn pages with MultiOn.
+
+    Browser sessions are borrowed from a SessionPool and reused across scrapes, with up to
+    pool_size sessions per site. Every MultiOn call goes through the rate_limiter, which adapts
+    the request rate and concurrency per site to how healthy the responses are, and every scrape
+    goes through `resilience`, which retries transient failures, stops calling a site whose
+    circuit breaker is open and optionally hedges slow scrapes. Profiles are retrieved with the
+    fields of `projections` only (by default every field an output column can use), starting with
+    the cheapest render and escalating while a required field is empty. Call close()
+    (or use the scraper as a context manager) to close the sessions when done.
+    """
+
+    # Number of users scrape_github_batch looks up at once
+    GITHUB_BATCH_SIZE = 1
+
+    def __init__(self, use_agentops: bool = False, pool_size: int = 1, max_session_uses: int = 50,
+                 linkedin_max_steps: int = 10, linkedin_timeout: float = 120,
+                 rate_limiter: Optional[RateLimiter] = None, resilience: Optional[Resilience] = None,
+                 projections: Optional[Dict[str, FieldProjection]] = None):
         self.multion_api_key = os.environ.get("MULTION_API_KEY")
         if not self.multion_api_key:
             raise ValueError("MULTION_API_KEY is not set in .env variables\nGet your API key from https://app.multion.ai/api-keys")
@@ -45,32 +95,42 @@ class MultiOnUtils:
             self.agentops_api_key = os.environ.get("AGENTOPS_API_KEY")
             if not self.agentops_api_key:
                 raise ValueError("AGENTOPS_API_KEY is not set in .env variables\nGet your API key from https://app.agentops.ai/settings/projects")
-            self.client = MultiOn(api_key=self.multion_api_key, agentops_api_key=self.agentops_api_key)
+            self.client = create_multion_client(api_key=self.multion_api_key, agentops_api_key=self.agentops_api_key)
         else:
             # If you still get AgentOps unintentionally running here, remove or comment AGENTOPS_API_KEY os variable
-            self.client = MultiOn(api_key=self.multion_api_key)
+            self.client = create_multion_client(api_key=self.multion_api_key)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.resilience = resilience or Resilience()
+        # Hedged attempts borrow a session of their own, so they get sessions on top of the workers' ones
+        self.pool_size = pool_size
+        self.session_pool = SessionPool(self.client, size=pool_size + self.resilience.hedge_capacity(),
+                                        max_uses=max_session_uses, rate_limiter=self.rate_limiter)
+        self.linkedin_max_steps = linkedin_max_steps
+        self.linkedin_timeout = linkedin_timeout
+        self.projections = projections or build_projections(
+            set(GITHUB_FIELDS_BY_COLUMN) | set(LINKEDIN_FIELDS_BY_COLUMN), scrape_linkedin=True)
+        self.projection_stats = ProjectionStats(self.projections)
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.resilience.close()
+        self.session_pool.close()
 
     def scrape_github(self, user = "areibman") -> GitHubUserData:
-        create_response = self.client.sessions.create(
-            url=f"https://github.com/{user}",
-            local=True,
+        return self.resilience.call("github", "github_profile", self._scrape_github, user)
 
-        )
-        print("scraping")
-
-        session_id = create_response.session_id
-        retrieve_response = self.client.retrieve(
-            session_id=session_id,
-            cmd="Get name, location, number of repositories, count of contributions in the last year, followers, following count, linkedin url, github url and email",
-            fields=["name", "location", "public_repositories", "last_year_contributions_count",
-                    "github_followers_count", "github_following_count", "linkedin_url", "github_url", "email"],
-            scroll_to_bottom=False,
-            render_js=True,
-        )
+    def _scrape_github(self, user: str) -> GitHubUserData:
+        profile_url = f"https://github.com/{user}"
 
-        print(f"Raw data: {retrieve_response.data}")
-        data = retrieve_response.data[0] if retrieve_response.data else {}
+        with self.session_pool.session("github", profile_url) as session:
+            data = self._retrieve_projected(session, profile_url, "github", render_js=True)
+
+        logger.debug(f"Raw data: {data}")
 
         # Extract email from raw data (sometimes scraper fetches prefixes or suffixes with an email)
         email_raw = data.get("email", "")
@@ -87,39 +147,71 @@ class MultiOnUtils:
             linkedin_url=data.get("linkedin_url"),
             twitter_url=data.get("twitter_url"),
             email=email,
+            username=user,
         )
 
+    def scrape_github_batch(self, users: List[str]) -> List[GitHubUserData]:
+        return [self.scrape_github(user) for user in users]
+
     def scrape_linkedin(self, link = "https://www.linkedin.com/in/alex-reibman-67951589") -> LinkedInData:
-        create_response = self.client.sessions.create(
-            url="https://linkedin.com",
-            local=True
-        )
+        """
+        Navigate to a LinkedIn profile and retrieve its data, within a step budget and deadline.
 
-        session_id = create_response.session_id
-        status = "CONTINUE"
+        Sessions that already reached a profile are logged in, so they first try to open the
+        profile URL directly. Otherwise (or if that shows no profile) the agent is stepped towards
+        the profile, with exponential backoff between steps. If the profile is not reached within
+        linkedin_max_steps steps or linkedin_timeout seconds, a LinkedInData with timed_out=True
+        is returned and the session is recycled.
+        """
+        return self.resilience.call("linkedin", "linkedin_profile", self._scrape_linkedin, link)
 
+    def _scrape_linkedin(self, link: str) -> LinkedInData:
+        deadline = time.monotonic() + self.linkedin_timeout
         linkedin_url = f"{link}"
+        data = {}
 
-        while status == "CONTINUE":
-            step_response = self.client.sessions.step(
-                session_id=session_id,
-                cmd=f"Go to {linkedin_url}"
-            )
-            status = step_response.status
-
-        retrieve_response = self.client.retrieve(
-            session_id=session_id,
-            cmd="Get name, headline, location, current position, profile URL, number of followers and email",
-            fields=["name", "headline", "location", "current_position", "profile_url", "num_followers", "email"],
-            scroll_to_bottom=False,
-            render_js=True,
-            full_page=True,
-            local=True
-        )
+        with self.session_pool.session("linkedin", "https://linkedin.com") as session:
+            state = LINKEDIN_DIRECT if session.logged_in else LINKEDIN_NAVIGATE
+            steps = 0
+            backoff = LINKEDIN_BACKOFF_SECONDS
 
-        print(retrieve_response.data[0])
-        data = retrieve_response.data[0] if retrieve_response.data else {}
-        print(f"Raw LinkedIn data: {data}")
+            while state not in (LINKEDIN_DONE, LINKEDIN_TIMED_OUT):
+                if state == LINKEDIN_DIRECT:
+                    # Without a name this is not the profile page (e.g. a login wall), a costlier render won't help
+                    data = self._retrieve_linkedin(session, linkedin_url, escalate_if=lambda data: bool(data.get("name")))
+                    state = LINKEDIN_DONE if data.get("name") else LINKEDIN_NAVIGATE
+
+                elif state == LINKEDIN_NAVIGATE:
+                    if steps >= self.linkedin_max_steps or time.monotonic() >= deadline:
+                        state = LINKEDIN_TIMED_OUT
+                        continue
+                    with self.rate_limiter.slot(session.target, "multion"), \
+                            metrics.timed("multion_step", target=session.target):
+                        step_response = self.client.sessions.step(
+                            session_id=session.session_id,
+                            cmd=f"Go to {linkedin_url}"
+                        )
+                    steps += 1
+                    if step_response.status == "CONTINUE":
+                        time.sleep(min(backoff, max(0, deadline - time.monotonic())))
+                        backoff = min(backoff * 2, LINKEDIN_MAX_BACKOFF_SECONDS)
+                    else:
+                        session.current_url = linkedin_url
+                        state = LINKEDIN_RETRIEVE
+
+                elif state == LINKEDIN_RETRIEVE:
+                    data = self._retrieve_linkedin(session, linkedin_url)
+                    if data.get("name"):
+                        session.logged_in = True
+                    state = LINKEDIN_DONE
+
+            if state == LINKEDIN_TIMED_OUT:
+                logger.warning(f"Timed out navigating to {linkedin_url} after {steps} steps")
+                session.recycle = True
+                return LinkedInData(name="", location="", curr_job="", num_followers=0, headline="",
+                                    email=None, timed_out=True)
+
+        logger.debug(f"Raw LinkedIn data: {data}")
 
         return LinkedInData(
             name=data.get("name", ""),
@@ -130,27 +222,59 @@ class MultiOnUtils:
             email=data.get("email"),
         )
 
+    def _retrieve_linkedin(self, session: PooledSession, linkedin_url: str,
+                           escalate_if: Optional[Callable[[dict], bool]] = None) -> dict:
+        return self._retrieve_projected(session, linkedin_url, "linkedin", escalate_if=escalate_if,
+                                        render_js=True, local=True)
+
+    def _retrieve_projected(self, session: PooledSession, url: str, scrape: str,
+                            escalate_if: Optional[Callable[[dict], bool]] = None, **kwargs) -> dict:
+        """
+        Retrieve the fields of the scrape's projection, from the cheapest render tier up.
+
+        A full-page render, then scrolling, is only tried while a required field came back empty
+        (and escalate_if, if given, accepts the data so far). Fields found by any tier are kept.
+        A tier that returned no data at all means the page itself is missing, not a field, so
+        richer tiers are not tried for it.
+        """
+        projection = self.projections[scrape]
+        data = {}
+        for tier_index, (tier, options) in enumerate(TIERS):
+            start = time.monotonic()
+            retrieve_response = self._retrieve(session, url, cmd=projection.cmd, fields=list(projection.fields),
+                                               **{**kwargs, "scroll_to_bottom": False, **options})
+            tier_data = retrieve_response.data[0] if retrieve_response.data else {}
+            data.update({field: value for field, value in tier_data.items() if value not in (None, '')})
+            escalate = bool(tier_data) and bool(projection.missing(data)) and tier_index + 1 < len(TIERS) \
+                and (escalate_if is None or escalate_if(data))
+            self.projection_stats.record(scrape, tier, time.monotonic() - start, escalate)
+            if not escalate:
+                break
+        return data
+
     def scrape_repo(self, repo_url: str) -> RepoData:
-        create_response = self.client.sessions.create(
-            url=repo_url,
-            local=True
-        )
+        return self.resilience.call("github", "repo", self._scrape_repo, repo_url)
 
-        session_id = create_response.session_id
-        retrieve_response = self.client.retrieve(
-            session_id=session_id,
-            cmd="Get name, description and number of repo stars",
-            fields=["name, description", "number_of_stars"],
-            render_js=True,
-            max_items=5
-        )
+    def _scrape_repo(self, repo_url: str) -> RepoData:
+        with self.session_pool.session("github", repo_url) as session:
+            retrieve_response = self._retrieve(
+                session,
+                repo_url,
+                cmd="Get name, description and number of repo stars",
+                fields=["name, description", "number_of_stars"],
+                render_js=True,
+                max_items=5
+            )
 
-        print(f"Raw data: {retrieve_response.data}")
+        logger.debug(f"Raw data: {retrieve_response.data}")
         data = retrieve_response.data[0] if retrieve_response.data else {}
 
         # Extract numeric part and convert to int
-        stars_str = data.get("number_of_stars", "0")
-        num_stars = int(re.sub(r'[^0-9]', '', stars_str))
+        stars_digits = re.sub(r'[^0-9]', '', str(data.get("number_of_stars") or ""))
+        if not stars_digits:
+            # The page did not render its star count, which is worth another try
+            raise EmptyResponseError(f"No star count in the scraped data of {repo_url}: {data}")
+        num_stars = int(stars_digits)
 
         return RepoData(
             name=data.get("name", ""),
@@ -158,26 +282,88 @@ class MultiOnUtils:
             num_stars=num_stars
         )
 
-    def scrape_stargazers(self, repo_url: str) -> List[StargazerData]:
-        create_response = self.client.sessions.create(url=f"{repo_url}/stargazers", local=True)
-        retrieve_response = self.client.retrieve(
-            session_id=create_response.session_id,
-            cmd="Get username for all users",
-            fields=["username"],
-            render_js=True,
-            scroll_to_bottom=False,
-            full_page=True,
-            max_items=5
-        )
-        print(f"Stargazers scrape data: {retrieve_response.data}")
-        stargazers = []
-        if len(retrieve_response.data) > 0:
-            stargazers = [StargazerData(user_id=user.get('username', '')) for user in retrieve_response.data]
-        else:
-            print("Did not scrape any users. Retry running the script or debug MultiOn retriever at:\nhttps://docs.multion.ai/api-reference/autonomous-api-reference/retrieve")
-        print(f"Number of stargazers scraped: {len(stargazers)}")
+    def scrape_stargazers(self, repo_url: str, max_stargazers: Optional[int] = None) -> List[StargazerData]:
+        return list(self.iter_stargazers(repo_url, max_stargazers))
+
+    def iter_stargazers(self, repo_url: str, max_stargazers: Optional[int] = None,
+                        known: Optional[List[str]] = None, num_stars: Optional[int] = None) -> Iterator[StargazerData]:
+        """
+        Walk the stargazers pages of a repository and yield each stargazer as its page arrives.
+
+        Pages are fetched one at a time with a ?page=N cursor. Fetching stops when a page
+        yields no new users or as soon as max_stargazers users have been yielded.
+
+        known lists the logins of an earlier listing of the repo in its order, e.g. the last
+        snapshot, and num_stars the current star count. GitHub lists the newest stargazers first,
+        so once the users read so far that are not known, plus the known ones, add up to num_stars,
+        the remaining known users are yielded without reading their pages.
+        """
+        seen = set()
+        known = known if known and num_stars is not None and max_stargazers is None else []
+        known_logins = set(known)
+        page = 1
+        while max_stargazers is None or len(seen) < max_stargazers:
+            remaining = STARGAZERS_PER_PAGE if max_stargazers is None else max_stargazers - len(seen)
+            page_url = f"{repo_url.rstrip('/')}/stargazers?page={page}"
+            page_data = self.resilience.call("github", "stargazers_page", self._scrape_stargazers_page,
+                                             page_url, min(remaining, STARGAZERS_PER_PAGE))
+            logger.debug(f"Stargazers page {page} scrape data: {page_data}")
+
+            new_users = 0
+            for user in page_data:
+                user_id = user.get('username', '')
+                # Pages can shift while new stars come in, so skip users seen on an earlier page
+                if not user_id or user_id in seen:
+                    continue
+                seen.add(user_id)
+                new_users += 1
+                yield StargazerData(user_id=user_id)
+                if max_stargazers is not None and len(seen) >= max_stargazers:
+                    break
+
+            if new_users == 0:
+                if page == 1:
+                    logger.warning("Did not scrape any users. Retry running the script or debug MultiOn retriever at:\nhttps://docs.multion.ai/api-reference/autonomous-api-reference/retrieve")
+                break
+            if known and len(seen - known_logins) + len(known) == num_stars:
+                skipped = [login for login in known if login not in seen]
+                if skipped:
+                    logger.info(f"Skipping {len(skipped)} stargazers of {repo_url} after page {page}, they are known")
+                for login in skipped:
+                    seen.add(login)
+                    yield StargazerData(user_id=login)
+                break
+            page += 1
+
+        logger.info(f"Number of stargazers scraped: {len(seen)}")
+
+    def _scrape_stargazers_page(self, page_url: str, max_items: int) -> List[dict]:
+        with self.session_pool.session("github", page_url) as session:
+            retrieve_response = self._retrieve(
+                session,
+                page_url,
+                cmd="Get username for all users",
+                fields=["username"],
+                # Walking the pages always ends on a page without users
+                may_be_empty=True,
+                render_js=True,
+                scroll_to_bottom=False,
+                full_page=True,
+                max_items=max_items
+            )
+        return retrieve_response.data or []
 
-        return stargazers
+    def _retrieve(self, session: PooledSession, url: str, may_be_empty: bool = False, **kwargs):
+        # Navigate the pooled session to url as part of the retrieve, unless it is already there
+        if session.current_url != url:
+            kwargs["url"] = url
+            session.current_url = url
+        with self.rate_limiter.slot(session.target, "multion") as outcome, \
+                metrics.timed("multion_retrieve", target=session.target):
+            response = self.client.retrieve(session_id=session.session_id, **kwargs)
+            # An empty page is often a CAPTCHA or a block rather than a page without data
+            outcome.empty = not response.data and not may_be_empty
+            return response
 
     def _to_int(self, variable):
         if isinstance(variable, int):
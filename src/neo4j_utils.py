@@ -0,0 +1,87 @@
+# https://neo4j.com/docs/python-manual/current/
+
+import os
+from typing import List, Tuple
+from neo4j import GraphDatabase
+
+from src.metrics import metrics
+from src.multion_utils import RepoData
+
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT user_login IF NOT EXISTS FOR (u:User) REQUIRE u.login IS UNIQUE",
+    "CREATE CONSTRAINT repo_url IF NOT EXISTS FOR (r:Repo) REQUIRE r.url IS UNIQUE",
+    "CREATE INDEX user_location IF NOT EXISTS FOR (u:User) ON (u.location)",
+]
+
+UPSERT_REPO_QUERY = """
+MERGE (r:Repo {url: $url})
+SET r.name = $name, r.description = $description, r.num_stars = $num_stars
+"""
+
+UPSERT_STARGAZERS_QUERY = """
+MATCH (r:Repo {url: $repo_url})
+UNWIND $rows AS row
+MERGE (u:User {login: row.login})
+SET u.name = row.name, u.location = row.location, u.followers = row.followers
+MERGE (u)-[s:STARRED]->(r)
+SET s.starred_at = row.starred_at, s.followers = row.followers, s.location = row.location
+"""
+
+
+def load_neo4j_settings() -> Tuple[str, str, str]:
+    """Read the Neo4j (AuraDB) URI, username and password from the environment."""
+    uri = os.environ.get("NEO4J_URI")
+    username = os.environ.get("NEO4J_USERNAME")
+    password = os.environ.get("NEO4J_PASSWORD")
+    if not uri or not username or not password:
+        raise ValueError("Please set up your Auradb credentials on https://neo4j.com/product/auradb/")
+    return uri, username, password
+
+
+class GraphWriter:
+    """
+    Writes stargazers straight into the Neo4j knowledge graph as (User)-[:STARRED]->(Repo).
+
+    Users and STARRED edges are upserted with UNWIND, batch_size rows per transaction.
+    Uniqueness constraints on User.login and Repo.url (which also index them) and an index
+    on User.location are created up front, so every MERGE is an index lookup.
+    """
+
+    def __init__(self, batch_size: int = 5000):
+        self.neo4j_uri, self.neo4j_username, self.neo4j_password = load_neo4j_settings()
+        self.batch_size = batch_size
+        self.driver = GraphDatabase.driver(self.neo4j_uri, auth=(self.neo4j_username, self.neo4j_password))
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self.driver.session() as session:
+            for query in SCHEMA_QUERIES:
+                session.run(query).consume()
+        self._schema_ready = True
+
+    def upsert_stargazers(self, repo_url: str, repo: RepoData, rows: List[dict]) -> int:
+        """
+        Upsert a repository and its stargazers.
+
+        Each row has login, name, location, followers and starred_at (which may be None).
+        Returns the number of rows written.
+        """
+        self.ensure_schema()
+        with self.driver.session() as session:
+            with metrics.timed("neo4j_write", query="repo"):
+                session.execute_write(
+                    lambda tx: tx.run(UPSERT_REPO_QUERY, url=repo_url, name=repo.name,
+                                      description=repo.description, num_stars=repo.num_stars).consume()
+                )
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                with metrics.timed("neo4j_write", query="stargazers"):
+                    session.execute_write(
+                        lambda tx: tx.run(UPSERT_STARGAZERS_QUERY, repo_url=repo_url, rows=batch).consume()
+                    )
+        return len(rows)
+
+    def close(self):
+        self.driver.close()
@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from src.multion_utils import GitHubUserData, LinkedInData
+from src.projection import FieldProjection
+
+
+class ProfileCache:
+    """
+    Local on-disk cache of scraped GitHub and LinkedIn profiles.
+
+    Profiles are stored in a SQLite database keyed by GitHub username or LinkedIn URL,
+    together with the time they were scraped. Entries older than max_age_hours are
+    treated as misses. With refresh=True every lookup misses, but fresh results are
+    still written back so the next run can use them.
+
+    With `projections`, each profile remembers the fields it was scraped with, and a profile
+    scraped with fewer fields than the current projection is a miss too.
+    """
+
+    def __init__(self, path: str = "data/profile_cache.sqlite", max_age_hours: float = 24, refresh: bool = False,
+                 projections: Optional[Dict[str, FieldProjection]] = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_age_seconds = max_age_hours * 3600
+        self.refresh = refresh
+        self.projections = projections or {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " scraped_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, key))"
+        )
+        self._conn.commit()
+
+    def get_github(self, user: str) -> Optional[GitHubUserData]:
+        data = self._get("github", user)
+        if data is None:
+            return None
+        data.setdefault("username", user)
+        return GitHubUserData(**data)
+
+    def put_github(self, user: str, user_data: GitHubUserData):
+        # Don't remember failed scrapes, they should be retried on the next run
+        if any(value for field, value in asdict(user_data).items() if field != "username"):
+            self._put("github", user, user_data)
+
+    def get_linkedin(self, link: str) -> Optional[LinkedInData]:
+        data = self._get("linkedin", link)
+        return LinkedInData(**data) if data is not None else None
+
+    def put_linkedin(self, link: str, profile: LinkedInData):
+        if profile.name:
+            self._put("linkedin", link, profile)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = (100 * self.hits / total) if total else 0
+        return f"Profile cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate)"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get(self, kind, key):
+        with self._lock:
+            row = None
+            if not self.refresh:
+                row = self._conn.execute(
+                    "SELECT data FROM profiles WHERE kind = ? AND key = ? AND scraped_at >= ?",
+                    (kind, key, time.time() - self.max_age_seconds),
+                ).fetchone()
+            data = json.loads(row[0]) if row is not None else None
+            # Profiles cached before projections were recorded were scraped with every field
+            fields = data.pop("_fields", None) if data is not None else None
+            if data is None or (kind in self.projections and fields is not None
+                                and not set(self.projections[kind].fields) <= set(fields)):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return data
+
+    def _put(self, kind, key, value):
+        data = asdict(value)
+        if kind in self.projections:
+            data["_fields"] = list(self.projections[kind].fields)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (kind, key, data, scraped_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(data), time.time()),
+            )
+            self._conn.commit()
@@ -0,0 +1,152 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+from src.metrics import metrics
+
+# Output column -> fields of the MultiOn retrieve of each page that fill it
+GITHUB_FIELDS_BY_COLUMN = {
+    'email': ['email'],
+    'name': ['name'],
+    'location': ['location'],
+    'github_followers': ['github_followers_count'],
+    'country': ['location'],
+    'lat': ['location'],
+    'lon': ['location'],
+}
+LINKEDIN_FIELDS_BY_COLUMN = {
+    'email': ['email'],
+    'name': ['name'],
+    'location': ['location'],
+    'linkedin_headline': ['headline'],
+    'current_position': ['current_position'],
+    'linkedin_followers': ['num_followers'],
+    'country': ['location'],
+    'lat': ['location'],
+    'lon': ['location'],
+}
+# Output columns an integration reads from the rows, besides the username
+INTEGRATION_COLUMNS = {
+    'mailchimp': ['email'],
+    'mem0': [],
+    'neo4j': ['name', 'location', 'github_followers'],
+}
+
+# How each field is asked for in the retrieve command
+FIELD_DESCRIPTIONS = {
+    'name': 'name',
+    'location': 'location',
+    'email': 'email',
+    'github_followers_count': 'followers',
+    'linkedin_url': 'linkedin url',
+    'headline': 'headline',
+    'current_position': 'current position',
+    'num_followers': 'number of followers',
+}
+
+# Fields every profile page shows, so an empty value means the page was not fully rendered. Fields
+# users may leave empty (email, location, ...) never cause an escalation.
+REQUIRED_FIELDS = {
+    'github': {'github_followers_count'},
+    'linkedin': {'name', 'headline', 'current_position'},
+}
+
+# Retrieve options of each tier, from cheapest to costliest. A scrape starts at its first tier and
+# only moves to the next one while a required field is empty.
+TIERS = [
+    ('viewport', {}),
+    ('full_page', {'full_page': True}),
+    ('scroll', {'full_page': True, 'scroll_to_bottom': True}),
+]
+
+# The fields scrape_github and scrape_linkedin used to ask for, the baseline of the cost report
+UNPROJECTED_FIELD_COUNTS = {'github': 9, 'linkedin': 7}
+
+
+@dataclass(frozen=True)
+class FieldProjection:
+    """The fields one kind of scrape retrieves, and the ones that must not come back empty."""
+    scrape: str
+    fields: Tuple[str, ...]
+    required: Tuple[str, ...]
+
+    @property
+    def cmd(self) -> str:
+        descriptions = [FIELD_DESCRIPTIONS[field] for field in self.fields]
+        listed = ", ".join(descriptions[:-1]) + f" and {descriptions[-1]}" if len(descriptions) > 1 else descriptions[0]
+        return f"Get {listed}"
+
+    def missing(self, data: dict) -> List[str]:
+        return [field for field in self.required if data.get(field) in (None, '')]
+
+
+def needed_columns(columns: Iterable[str], integrations: Iterable[str] = ()) -> Set[str]:
+    """The output columns plus the columns the enabled integrations read."""
+    needed = set(columns)
+    for integration in integrations:
+        needed.update(INTEGRATION_COLUMNS[integration])
+    return needed
+
+
+def build_projections(columns: Iterable[str], scrape_linkedin: bool = False,
+                      integrations: Iterable[str] = ()) -> Dict[str, FieldProjection]:
+    """
+    The minimal GitHub and LinkedIn projections filling the given output columns.
+
+    Columns read by the enabled integrations are added, and the GitHub scrape also retrieves the
+    LinkedIn URL when LinkedIn profiles are scraped. A LinkedIn profile is only recognized by its
+    name, so the LinkedIn projection always includes it.
+    """
+    columns = needed_columns(columns, integrations)
+
+    github_fields = {field for column in columns for field in GITHUB_FIELDS_BY_COLUMN.get(column, [])}
+    if scrape_linkedin:
+        github_fields.add('linkedin_url')
+    linkedin_fields = {'name'} | {field for column in columns for field in LINKEDIN_FIELDS_BY_COLUMN.get(column, [])}
+    if not github_fields:
+        github_fields.add('name')  # A retrieve needs at least one field
+
+    projections = {}
+    for scrape, fields in (('github', github_fields), ('linkedin', linkedin_fields)):
+        ordered = tuple(field for field in FIELD_DESCRIPTIONS if field in fields)
+        projections[scrape] = FieldProjection(scrape, ordered,
+                                              tuple(field for field in ordered if field in REQUIRED_FIELDS[scrape]))
+    return projections
+
+
+class ProjectionStats:
+    """Retrieves and seconds spent per scrape and tier, to report what a projection cost."""
+
+    def __init__(self, projections: Dict[str, FieldProjection]):
+        self.projections = projections
+        self._retrieves: Dict[Tuple[str, str], int] = {}
+        self._seconds: Dict[Tuple[str, str], float] = {}
+        self._escalations: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, scrape: str, tier: str, seconds: float, escalated: bool):
+        with self._lock:
+            key = (scrape, tier)
+            self._retrieves[key] = self._retrieves.get(key, 0) + 1
+            self._seconds[key] = self._seconds.get(key, 0) + seconds
+            if escalated:
+                self._escalations[key] = self._escalations.get(key, 0) + 1
+        if escalated:
+            metrics.increment("projection_escalations", scrape=scrape, tier=tier)
+
+    def summary(self) -> str:
+        """Projection and cost per tier of each scrape that retrieved anything, empty if none did."""
+        lines = []
+        with self._lock:
+            for scrape, projection in self.projections.items():
+                if not any(key[0] == scrape for key in self._retrieves):
+                    continue
+                lines.append(f"{scrape} projection: {len(projection.fields)} of {UNPROJECTED_FIELD_COUNTS[scrape]} "
+                             f"fields ({', '.join(projection.fields)}), required: {', '.join(projection.required) or '-'}")
+                for tier, _ in TIERS:
+                    retrieves = self._retrieves.get((scrape, tier), 0)
+                    if retrieves:
+                        seconds = self._seconds[(scrape, tier)]
+                        lines.append(f"  {tier}: {retrieves} retrieves, {seconds:.1f}s ({seconds / retrieves:.2f}s avg), "
+                                     f"{self._escalations.get((scrape, tier), 0)} escalated")
+        return "\n".join(lines)
@@ -0,0 +1,164 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from src.metrics import metrics
+
+
+@dataclass
+class RateLimit:
+    """Limits of one remote target: requests per second, burst size and concurrent requests."""
+    rate: float
+    burst: int
+    max_concurrency: int
+    min_concurrency: int = 1
+    # Requests slower than this count as a sign of throttling
+    slow_seconds: float = 30
+
+
+# github and linkedin are the sites MultiOn browses, multion is the MultiOn API itself and
+# github_api the GitHub REST/GraphQL API (5000 requests per hour with a token)
+DEFAULT_RATE_LIMITS = {
+    "github": RateLimit(rate=5, burst=5, max_concurrency=8, slow_seconds=30),
+    "linkedin": RateLimit(rate=0.5, burst=2, max_concurrency=4, slow_seconds=60),
+    "multion": RateLimit(rate=10, burst=10, max_concurrency=16, slow_seconds=60),
+    "github_api": RateLimit(rate=1.3, burst=10, max_concurrency=4, slow_seconds=10),
+}
+
+
+class SlotOutcome:
+    """Lets the caller report a response that succeeded but looks throttled, e.g. came back empty."""
+
+    def __init__(self):
+        self.empty = False
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the number of seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimiter:
+    """
+    Rate and concurrency limit of one target, adapted with AIMD (additive increase, multiplicative decrease).
+
+    Requests take a concurrency slot and a token. The concurrency limit starts at half of
+    max_concurrency and grows by one for every window of healthy requests, up to max_concurrency.
+    A request that raises, comes back empty or takes longer than slow_seconds halves it. The token
+    bucket rate scales with the concurrency limit, so backing off also slows down the request rate.
+    Only one decrease happens per window: failures of requests started before the last decrease
+    are ignored.
+    """
+
+    DECREASE_FACTOR = 0.5
+
+    def __init__(self, target: str, limit: RateLimit):
+        self.target = target
+        self.limit = limit
+        self.concurrency = float(max(limit.min_concurrency, limit.max_concurrency / 2))
+        self.in_flight = 0
+        self.backoffs = 0
+        self.bucket = TokenBucket(self._current_rate(), limit.burst)
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while self.in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self.in_flight += 1
+        waited = self.bucket.acquire()
+        if waited:
+            metrics.observe("rate_limit_wait", waited, target=self.target)
+
+        outcome = SlotOutcome()
+        start = time.monotonic()
+        healthy = False
+        try:
+            yield outcome
+            healthy = not outcome.empty and time.monotonic() - start <= self.limit.slow_seconds
+        finally:
+            self._release(healthy, start)
+
+    def _release(self, healthy: bool, start: float):
+        with self._condition:
+            self.in_flight -= 1
+            if healthy:
+                self.concurrency = min(self.limit.max_concurrency, self.concurrency + 1 / self.concurrency)
+            elif start >= self._last_decrease:
+                self.concurrency = max(self.limit.min_concurrency, self.concurrency * self.DECREASE_FACTOR)
+                self._last_decrease = time.monotonic()
+                self.backoffs += 1
+                metrics.increment("rate_limit_backoffs", target=self.target)
+            self.bucket.rate = self._current_rate()
+            self._condition.notify_all()
+
+    def _current_rate(self) -> float:
+        return self.limit.rate * self.concurrency / self.limit.max_concurrency
+
+    def __str__(self):
+        return (f"{self.target}: {self.bucket.rate:.2f}/s of {self.limit.rate:g}/s, "
+                f"concurrency {int(self.concurrency)}/{self.limit.max_concurrency}, {self.backoffs} backoffs")
+
+
+class RateLimiter:
+    """
+    Adaptive limiters of every remote target, shared by all scrapers of a run.
+
+    Wrap each remote request in `with rate_limiter.slot("linkedin", "multion") as outcome:` to take
+    a slot of every target it hits, and set outcome.empty when the response looks throttled.
+    Targets are always acquired in the order given, so callers should list the site before "multion".
+    """
+
+    def __init__(self, limits: Optional[Dict[str, RateLimit]] = None):
+        limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self.limiters = {target: AdaptiveLimiter(target, limit) for target, limit in limits.items()}
+
+    @contextmanager
+    def slot(self, *targets: str):
+        with ExitStack() as stack:
+            outcomes = [stack.enter_context(self.limiters[target].slot()) for target in targets]
+            outcome = SlotOutcome()
+            yield outcome
+            for target_outcome in outcomes:
+                target_outcome.empty = outcome.empty
+
+    def summary(self) -> str:
+        return "\n".join(f"Rate limit {limiter}" for limiter in self.limiters.values())
+
+
+def parse_rate_limit(value: str) -> Dict[str, RateLimit]:
+    """Parse a --rate-limit value, TARGET=RATE[:MAX_CONCURRENCY], e.g. linkedin=0.2:2"""
+    target, _, spec = value.partition("=")
+    if target not in DEFAULT_RATE_LIMITS or not spec:
+        raise ValueError(f"Expected TARGET=RATE[:MAX_CONCURRENCY] with TARGET one of {', '.join(DEFAULT_RATE_LIMITS)}")
+    rate, _, concurrency = spec.partition(":")
+    default = DEFAULT_RATE_LIMITS[target]
+    limit = RateLimit(rate=float(rate), burst=default.burst,
+                      max_concurrency=int(concurrency) if concurrency else default.max_concurrency,
+                      min_concurrency=default.min_concurrency, slow_seconds=default.slow_seconds)
+    if limit.rate <= 0 or limit.max_concurrency < limit.min_concurrency:
+        raise ValueError(f"Invalid rate limit for {target}: {spec}")
+    return {target: limit}
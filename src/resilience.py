@@ -0,0 +1,310 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, TypeVar
+
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, throttling and server errors
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+
+class EmptyResponseError(Exception):
+    """A scrape returned no usable data, which usually means a block or a page that did not render."""
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the target when the trial call a caller waited for failed."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error as transient (worth retrying) or permanent.
+
+    Timeouts, connection errors, empty responses and HTTP 408/425/429/5xx are transient.
+    Other HTTP errors (bad request, unauthorized, payment required, ...) and errors raised while
+    parsing a response are permanent, as retrying would fail the same way.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (EmptyResponseError, TimeoutError, ConnectionError)):
+        return True
+    # MultiOn's ApiError has status_code, urllib's HTTPError has code
+    status_code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    # Transport errors of the HTTP client used by the MultiOn SDK
+    return any(cls.__module__.startswith("httpx") and cls.__name__ in ("TransportError", "TimeoutException")
+               for cls in type(error).__mro__)
+
+
+@dataclass
+class RetryPolicy:
+    """Retries of transient errors, with full jitter: each delay is random in [0, base_delay * 2 ** retry]."""
+    max_attempts: int = 3
+    base_delay: float = 1
+    max_delay: float = 30
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a target after failure_threshold consecutive transient failures.
+
+    While open, calls wait in before_call(). After reset_seconds the circuit is half-open and lets
+    a single trial call through, while the others keep waiting: it closes again if the trial
+    succeeds, letting them all through, and reopens if it fails, in which case the calls that
+    waited for it fail with CircuitOpenError.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, target: str, failure_threshold: int = 5, reset_seconds: float = 60):
+        self.target = target
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._openings = 0
+        self._trial_in_flight = False
+        self._condition = threading.Condition()
+
+    def before_call(self):
+        """Return once a call may go through, waiting while the circuit is open or its trial call runs."""
+        with self._condition:
+            openings = self._openings
+            waited = False
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self._openings != openings:
+                    metrics.increment("circuit_rejected", target=self.target)
+                    raise CircuitOpenError(f"Circuit breaker of {self.target} reopened after {self.failures} failures")
+                remaining = None
+                if self.state == self.OPEN:
+                    remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        self._trial_in_flight = False
+                if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+                if not waited:
+                    metrics.increment("circuit_waits", target=self.target)
+                    waited = True
+                self._condition.wait(remaining)
+
+    def record_success(self):
+        with self._condition:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit breaker of {self.target} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit breaker of {self.target} opened after {self.failures} failures, "
+                               f"retrying in {self.reset_seconds:g}s")
+                metrics.increment("circuit_opened", target=self.target)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._openings += 1
+                self._trial_in_flight = False
+                self._condition.notify_all()
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls of one operation, to estimate its p95."""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q quantile of the recent latencies, or None until min_samples calls were recorded."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class Resilience:
+    """
+    Retries, circuit breaking and hedging of remote calls, shared by all scrapes of a run.
+
+    call(target, operation, fn, *args) runs fn through the circuit breaker of the target site,
+    retrying transient errors (see is_retryable) with jittered exponential backoff. While a
+    circuit is open, calls wait for it to half-open instead of failing, and a failed trial call
+    uses up an attempt of the calls that waited for it. Permanent errors and the last error once
+    the attempts are used up are raised to the caller, so real failures are never turned into
+    empty data.
+
+    With hedge=True, an attempt that runs longer than the p95 latency of its operation starts a
+    second, identical attempt, and whichever answers first is used. The other one finishes in the
+    background and its result is dropped, so only idempotent calls may be hedged. At most
+    hedge_budget of the calls are hedged, which keeps the extra load bounded while a site is slow,
+    and at most max_concurrent_hedges hedges run at once, so owners of a session pool can size it
+    with hedge_capacity() to keep a session free for them.
+    """
+
+    def __init__(self, retry_policy: Optional[RetryPolicy] = None, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_budget: float = 0.1, min_hedge_delay: float = 0,
+                 failure_threshold: int = 5, reset_seconds: float = 60, max_hedge_workers: int = 32,
+                 max_concurrent_hedges: int = 1):
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_hedge_workers = max_hedge_workers
+        self.max_concurrent_hedges = max_concurrent_hedges
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self._calls = 0
+        self._hedges = 0
+        self._hedges_running = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def call(self, target: str, operation: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        breaker = self._breaker(target)
+        attempt = 1
+        while True:
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                # The trial call this one waited for failed, which uses up an attempt
+                if attempt >= self.retry_policy.max_attempts:
+                    raise
+                attempt += 1
+                continue
+            try:
+                result = self._attempt(operation, fn, *args, **kwargs)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # The target answered, the request itself is at fault
+                    breaker.record_success()
+                if not retryable or attempt >= self.retry_policy.max_attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt - 1)
+                logger.warning(f"{operation} failed ({type(e).__name__}: {str(e)}), "
+                               f"retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.1f}s")
+                metrics.increment("retries", operation=operation)
+                time.sleep(delay)
+                attempt += 1
+            else:
+                breaker.record_success()
+                return result
+
+    def hedge_capacity(self) -> int:
+        """Number of extra sessions hedged attempts can hold at once, 0 without hedging."""
+        return self.max_concurrent_hedges if self.hedge else 0
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            # Losing hedged attempts are left to finish on their own
+            executor.shutdown(wait=False)
+
+    def _attempt(self, operation: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        tracker = self._tracker(operation)
+        with self._lock:
+            self._calls += 1
+        hedge_delay = tracker.quantile(self.hedge_quantile) if self.hedge else None
+        if hedge_delay is None:
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            tracker.record(time.perf_counter() - start)
+            return result
+        return self._hedged(operation, tracker, max(hedge_delay, self.min_hedge_delay), fn, *args, **kwargs)
+
+    def _hedged(self, operation: str, tracker: LatencyTracker, hedge_delay: float, fn: Callable[..., T],
+                *args, **kwargs) -> T:
+        def timed_fn():
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            tracker.record(time.perf_counter() - start)
+            return result
+
+        executor = self._hedge_executor()
+        primary = executor.submit(timed_fn)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done or not self._take_hedge():
+            return primary.result()
+
+        metrics.increment("hedges", operation=operation)
+        hedge = executor.submit(timed_fn)
+        hedge.add_done_callback(self._hedge_done)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                if hedge in succeeded and primary not in succeeded:
+                    metrics.increment("hedge_wins", operation=operation)
+                return succeeded[0].result()
+            if not pending:
+                # Both attempts failed: raise the error of the original one
+                return primary.result()
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.hedge_budget * self._calls:
+                return False
+            if self._hedges_running >= self.max_concurrent_hedges:
+                return False
+            self._hedges += 1
+            self._hedges_running += 1
+            return True
+
+    def _hedge_done(self, future: Future):
+        with self._lock:
+            self._hedges_running -= 1
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_hedge_workers,
+                                                    thread_name_prefix="hedge")
+            return self._executor
+
+    def _breaker(self, target: str) -> CircuitBreaker:
+        with self._lock:
+            if target not in self.breakers:
+                self.breakers[target] = CircuitBreaker(target, self.failure_threshold, self.reset_seconds)
+            return self.breakers[target]
+
+    def _tracker(self, operation: str) -> LatencyTracker:
+        with self._lock:
+            if operation not in self.latencies:
+                self.latencies[operation] = LatencyTracker()
+            return self.latencies[operation]
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.metrics import metrics
+from src.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PooledSession:
+    session_id: str
+    target: str
+    current_url: Optional[str] = None
+    logged_in: bool = False
+    recycle: bool = False
+    uses: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionPool:
+    """
+    Pool of warm MultiOn browser sessions, kept per target site (e.g. "github", "linkedin").
+
+    Instead of creating a new session for every page, a scrape borrows an idle session of
+    its target and navigates it to the next URL. At most `size` sessions are open per target.
+    A session is recycled (closed and replaced) after `max_uses` scrapes, when it has been idle
+    longer than `max_idle_seconds` (MultiOn expires inactive sessions), when a scrape using it
+    failed or when the scrape flagged it with `recycle`. All sessions are closed by close(),
+    which its owner calls once done with the pool.
+    """
+
+    def __init__(self, client, size: int = 1, max_uses: int = 50, max_idle_seconds: float = 300,
+                 rate_limiter: Optional[RateLimiter] = None):
+        if size < 1:
+            raise ValueError("Session pool size must be at least 1")
+        self.client = client
+        self.size = size
+        self.max_uses = max_uses
+        self.max_idle_seconds = max_idle_seconds
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.sessions_created = 0
+        self._idle: Dict[str, List[PooledSession]] = {}
+        self._open: Dict[str, int] = {}
+        self._all: Dict[str, PooledSession] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @contextmanager
+    def session(self, target: str, url: str):
+        """Borrow a session of `target`. New sessions are opened directly on `url`."""
+        session = self.acquire(target, url)
+        healthy = False
+        try:
+            yield session
+            healthy = True
+        finally:
+            self.release(session, healthy)
+
+    def acquire(self, target: str, url: str) -> PooledSession:
+        stale = []
+        try:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Session pool is closed")
+                    idle = self._idle.setdefault(target, [])
+                    while idle:
+                        session = idle.pop()
+                        if time.monotonic() - session.last_used <= self.max_idle_seconds:
+                            return session
+                        stale.append(self._discard(session))
+                    if self._open.get(target, 0) < self.size:
+                        # Reserve the slot before creating the session outside of the lock
+                        self._open[target] = self._open.get(target, 0) + 1
+                        break
+                    self._condition.wait()
+        finally:
+            for session in stale:
+                if session is not None:
+                    self._close_session(session)
+
+        try:
+            with self.rate_limiter.slot("multion"), metrics.timed("multion_session_create", target=target):
+                create_response = self.client.sessions.create(url=url, local=True)
+        except BaseException:
+            with self._condition:
+                if not self._closed:
+                    self._open[target] -= 1
+                self._condition.notify()
+            raise
+
+        session = PooledSession(session_id=create_response.session_id, target=target, current_url=url)
+        with self._condition:
+            self.sessions_created += 1
+            closed = self._closed
+            if not closed:
+                self._all[session.session_id] = session
+        if closed:
+            self._close_session(session)
+            raise RuntimeError("Session pool is closed")
+        return session
+
+    def release(self, session: PooledSession, healthy: bool = True):
+        with self._condition:
+            session.uses += 1
+            session.last_used = time.monotonic()
+            if healthy and not session.recycle and session.uses < self.max_uses and not self._closed:
+                self._idle.setdefault(session.target, []).append(session)
+                session = None
+            else:
+                session = self._discard(session)
+            self._condition.notify()
+        if session is not None:
+            self._close_session(session)
+
+    def close(self):
+        """Close every session opened by the pool. Safe to call more than once."""
+        with self._condition:
+            self._closed = True
+            sessions = list(self._all.values())
+            self._all.clear()
+            self._idle.clear()
+            self._open.clear()
+            self._condition.notify_all()
+        for session in sessions:
+            self._close_session(session)
+
+    def _discard(self, session: PooledSession) -> Optional[PooledSession]:
+        # Called with the lock held. Returns the session if the caller still has to close it.
+        if self._all.pop(session.session_id, None) is None:
+            return None  # Already closed by close()
+        self._open[session.target] -= 1
+        return session
+
+    def _close_session(self, session: PooledSession):
+        try:
+            with self.rate_limiter.slot("multion"), metrics.timed("multion_session_close", target=session.target):
+                self.client.sessions.close(session_id=session.session_id)
+        except Exception as e:
+            logger.warning(f"Failed to close MultiOn session {session.session_id}: {str(e)}")
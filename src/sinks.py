@@ -0,0 +1,155 @@
+import csv
+import json
+import os
+from typing import Dict, List
+
+# Output columns written as integers by typed formats (Parquet); empty values become nulls
+INTEGER_FIELDS = {'github_followers', 'linkedin_followers'}
+FLOAT_FIELDS = {'lat', 'lon'}
+
+
+class RowSink:
+    """
+    Writes stargazer rows to a file incrementally.
+
+    Rows are written to partial_path (the path with a .partial suffix) and flushed every
+    FLUSH_EVERY rows, so a run that dies part way through keeps everything written up to the
+    last flush. close() renames the file to its path, so a file under its final name is always
+    complete; close(complete=False) leaves it under the partial name.
+    """
+
+    FLUSH_EVERY = 50
+    PARTIAL_SUFFIX = '.partial'
+
+    def __init__(self, path: str, field_names: List[str]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.partial_path = path + self.PARTIAL_SUFFIX
+        self.field_names = field_names
+        self.row_count = 0
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
+
+    def write(self, row: dict):
+        self._buffer.append({field: row.get(field, '') for field in self.field_names})
+        self.row_count += 1
+        if len(self._buffer) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self._buffer = []
+
+    def close(self, complete: bool = True):
+        self.flush()
+        self._close_file()
+        if complete:
+            os.replace(self.partial_path, self.path)
+
+    def _write_rows(self, rows: List[dict]):
+        raise NotImplementedError
+
+    def _close_file(self):
+        raise NotImplementedError
+
+
+class CsvSink(RowSink):
+    def __init__(self, path: str, field_names: List[str]):
+        super().__init__(path, field_names)
+        self._file = open(self.partial_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=field_names)
+        self._writer.writeheader()
+
+    def _write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close_file(self):
+        self._file.close()
+
+
+class JsonlSink(RowSink):
+    def __init__(self, path: str, field_names: List[str]):
+        super().__init__(path, field_names)
+        self._file = open(self.partial_path, 'w', encoding='utf-8')
+
+    def _write_rows(self, rows):
+        self._file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self._file.flush()
+
+    def _close_file(self):
+        self._file.close()
+
+
+class ParquetSink(RowSink):
+    """
+    Writes each flush as a Parquet row group. Flushes are less frequent than for the text
+    formats to keep row groups reasonably large, and the file is only readable once closed.
+    """
+
+    FLUSH_EVERY = 1000
+
+    def __init__(self, path: str, field_names: List[str]):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+        super().__init__(path, field_names)
+        self._pa = pa
+        self.schema = pa.schema([
+            (field, pa.int64() if field in INTEGER_FIELDS else pa.float64() if field in FLOAT_FIELDS else pa.string())
+            for field in field_names
+        ])
+        self._writer = pq.ParquetWriter(self.partial_path, self.schema)
+
+    def _write_rows(self, rows):
+        columns = {
+            field: [self._to_value(field, row[field]) for row in rows] for field in self.field_names
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self.schema))
+
+    def _close_file(self):
+        self._writer.close()
+
+    def _to_value(self, field, value):
+        if value in ('', None):
+            return None
+        if field in INTEGER_FIELDS:
+            return int(value)
+        if field in FLOAT_FIELDS:
+            return float(value)
+        return str(value)
+
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+}
+
+
+def open_sink(path: str, field_names: List[str], output_format: str = 'csv') -> RowSink:
+    if output_format not in SINKS:
+        raise ValueError(f"Unsupported output format: {output_format}. Choose one of {', '.join(SINKS)}")
+    return SINKS[output_format](path, field_names)
+
+
+def read_rows(path: str) -> List[Dict[str, str]]:
+    """Read rows written by any sink, with all values as strings like csv.DictReader."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        rows = pq.read_table(path).to_pylist()
+        return [{field: '' if value is None else str(value) for field, value in row.items()} for row in rows]
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as jsonl_file:
+            return [{field: '' if value is None else str(value) for field, value in json.loads(line).items()}
+                    for line in jsonl_file if line.strip()]
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
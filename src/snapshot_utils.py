@@ -0,0 +1,80 @@
+import glob
+import json
+import os
+from typing import Dict, Optional
+
+from src.multion_utils import RepoData
+from src.sinks import read_rows
+
+DATA_DIR = "data"
+SNAPSHOT_INDEX = os.path.join(DATA_DIR, "snapshots.jsonl")
+
+
+def snapshot_filename(repo: RepoData, timestamp: str, delta: bool = False, extension: str = "csv") -> str:
+    """Return the path of a stargazers snapshot, e.g. data/Stargazers_of_<desc>__<timestamp>.csv"""
+    suffix = "__delta" if delta else ""
+    return os.path.join(DATA_DIR, f"Stargazers_of_{_snapshot_desc(repo)}__{timestamp}{suffix}.{extension}")
+
+
+def membership_filename(timestamp: str, extension: str = "csv") -> str:
+    """Return the path of the user x repo membership table of a multi-repo run."""
+    return os.path.join(DATA_DIR, f"Stargazers_membership__{timestamp}.{extension}")
+
+
+def record_snapshot(repo_url: str, path: str, timestamp: str, row_count: int, delta: bool = False):
+    """Append a snapshot to the index so later runs can find it by repository URL."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    entry = {
+        "repo_url": _normalize_repo_url(repo_url),
+        "path": path,
+        "timestamp": timestamp,
+        "rows": row_count,
+        "delta": delta,
+    }
+    with open(SNAPSHOT_INDEX, "a", encoding="utf-8") as index_file:
+        index_file.write(json.dumps(entry) + "\n")
+
+
+def latest_snapshot(repo_url: str, repo: RepoData) -> Optional[str]:
+    """
+    Find the most recent full snapshot written for a repository.
+
+    Snapshots recorded in the index are matched on the repository URL. Older snapshots
+    written before the index existed are matched on the file name prefix instead.
+    """
+    repo_url = _normalize_repo_url(repo_url)
+    candidates = []
+    indexed_paths = set()
+    if os.path.exists(SNAPSHOT_INDEX):
+        with open(SNAPSHOT_INDEX, encoding="utf-8") as index_file:
+            for line in index_file:
+                entry = json.loads(line)
+                indexed_paths.add(entry["path"])
+                if entry["repo_url"] == repo_url and not entry.get("delta") and os.path.exists(entry["path"]):
+                    candidates.append((float(entry["timestamp"]), entry["path"]))
+
+    if not candidates:
+        pattern = os.path.join(DATA_DIR, f"Stargazers_of_{glob.escape(_snapshot_desc(repo))}__*.csv")
+        for path in glob.glob(pattern):
+            if path in indexed_paths:
+                continue  # Indexed snapshot of another repo with the same description
+            timestamp = os.path.basename(path)[:-len(".csv")].rsplit("__", 1)[-1]
+            try:
+                candidates.append((float(timestamp), path))
+            except ValueError:
+                continue  # Delta files end with "__delta"
+
+    return max(candidates)[1] if candidates else None
+
+
+def read_snapshot(path: str) -> Dict[str, dict]:
+    """Read a snapshot (CSV, JSONL or Parquet) into a dict of rows keyed by username, preserving file order."""
+    return {row["username"]: row for row in read_rows(path) if row.get("username")}
+
+
+def _snapshot_desc(repo: RepoData) -> str:
+    return repo.description.replace(' ', '_')[:30]
+
+
+def _normalize_repo_url(repo_url: str) -> str:
+    return repo_url.rstrip("/").lower()
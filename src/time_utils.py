@@ -11,7 +11,6 @@ class Time:
         self.now = datetime.now(utc_tz)
         self.microsecond_timestamp = self.now.timestamp()
 
-        print(f"time: {self.microsecond_timestamp}")
 
     def __str__(self):
         return f"{self.microsecond_timestamp}"
\ No newline at end of file
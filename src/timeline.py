@@ -0,0 +1,154 @@
+import glob
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set
+
+from src.sinks import read_rows
+from src.snapshot_utils import DATA_DIR, SNAPSHOT_INDEX
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_CACHE_PATH = os.path.join(DATA_DIR, "timeline_cache.json")
+SNAPSHOT_EXTENSIONS = ("csv", "jsonl", "parquet")
+
+
+@dataclass
+class SnapshotFile:
+    repo: str  # Repository URL
+    path: str
+    timestamp: float
+
+
+@dataclass
+class SnapshotAggregate:
+    """Aggregates of one full snapshot, compared with the previous snapshot of the same repo."""
+    repo: str
+    path: str
+    timestamp: float
+    mtime: float
+    size: int
+    stargazers: int
+    new: int
+    churned: int
+    reach: int  # GitHub and LinkedIn followers of all stargazers
+    previous: Optional[str]  # Path of the snapshot new and churned are relative to
+
+
+def list_snapshots(data_dir: str = DATA_DIR, index_path: str = SNAPSHOT_INDEX) -> List[SnapshotFile]:
+    """
+    Full snapshots in the snapshot index that still exist, sorted by repo and time.
+
+    Only the index tells which repository a snapshot belongs to (file names only hold its
+    truncated description), and a snapshot is only indexed once its run completed. Other
+    Stargazers_of_* files, left by interrupted runs or written before the index existed, are
+    ignored.
+    """
+    snapshots = {}
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as index_file:
+            for line in index_file:
+                entry = json.loads(line)
+                if not entry.get("delta") and os.path.exists(entry["path"]):
+                    snapshots[entry["path"]] = SnapshotFile(entry["repo_url"], entry["path"],
+                                                            float(entry["timestamp"]))
+
+    unindexed = [path for extension in SNAPSHOT_EXTENSIONS
+                 for path in glob.glob(os.path.join(data_dir, f"Stargazers_of_*.{extension}"))
+                 if path not in snapshots and not path.endswith(f"__delta.{extension}")]
+    if unindexed:
+        logger.info(f"Ignoring {len(unindexed)} snapshot files missing from {index_path}")
+    return sorted(snapshots.values(), key=lambda snapshot: (snapshot.repo, snapshot.timestamp))
+
+
+class TimelineCache:
+    """
+    Per-snapshot aggregates of every repo, updated incrementally.
+
+    Aggregates are kept in a JSON file along with the logins of the latest snapshot of each repo.
+    A snapshot file is only read when it is new, or its modification time or size changed, so
+    after a nightly run update() reads the one new snapshot and compares it with the cached
+    logins of the previous one.
+    """
+
+    def __init__(self, path: str = TIMELINE_CACHE_PATH):
+        self.path = path
+        self.aggregates: Dict[str, SnapshotAggregate] = {}
+        self._latest_logins: Dict[str, dict] = {}  # Repo -> path and logins of its latest snapshot
+        self.files_read = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+            self.aggregates = {entry["path"]: SnapshotAggregate(**entry) for entry in cached["snapshots"]}
+            self._latest_logins = cached["latest_logins"]
+
+    def update(self, snapshots: List[SnapshotFile]) -> List[SnapshotAggregate]:
+        """Aggregates of the given snapshots, reading only those that changed since the last update."""
+        by_repo: Dict[str, List[SnapshotFile]] = {}
+        for snapshot in snapshots:
+            by_repo.setdefault(snapshot.repo, []).append(snapshot)
+
+        aggregates = {}
+        latest_logins = {}
+        for repo, repo_snapshots in by_repo.items():
+            repo_snapshots.sort(key=lambda snapshot: snapshot.timestamp)
+            previous: Optional[SnapshotFile] = None
+            previous_logins: Optional[Set[str]] = None  # Only known when the previous snapshot was read
+            for snapshot in repo_snapshots:
+                stat = os.stat(snapshot.path)
+                cached = self.aggregates.get(snapshot.path)
+                previous_path = previous.path if previous else None
+                if cached and cached.mtime == stat.st_mtime and cached.size == stat.st_size \
+                        and cached.previous == previous_path:
+                    aggregates[snapshot.path] = cached
+                    previous_logins = None
+                else:
+                    if previous and previous_logins is None:
+                        previous_logins = self._logins_of(repo, previous.path)
+                    logger.debug(f"Aggregating {snapshot.path}")
+                    rows = read_rows(snapshot.path)
+                    self.files_read += 1
+                    logins = {row["username"] for row in rows if row.get("username")}
+                    aggregates[snapshot.path] = SnapshotAggregate(
+                        repo=repo, path=snapshot.path, timestamp=snapshot.timestamp,
+                        mtime=stat.st_mtime, size=stat.st_size, stargazers=len(logins),
+                        new=len(logins - previous_logins) if previous_logins is not None else len(logins),
+                        churned=len(previous_logins - logins) if previous_logins is not None else 0,
+                        reach=sum(_to_int(row.get("github_followers")) + _to_int(row.get("linkedin_followers"))
+                                  for row in rows),
+                        previous=previous_path,
+                    )
+                    previous_logins = logins
+                previous = snapshot
+
+            if previous_logins is not None:
+                latest_logins[repo] = {"path": previous.path, "logins": sorted(previous_logins)}
+            elif repo in self._latest_logins and self._latest_logins[repo]["path"] == previous.path:
+                latest_logins[repo] = self._latest_logins[repo]
+
+        self.aggregates = aggregates
+        self._latest_logins = latest_logins
+        return sorted(aggregates.values(), key=lambda aggregate: (aggregate.repo, aggregate.timestamp))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"snapshots": [asdict(aggregate) for aggregate in self.aggregates.values()],
+                       "latest_logins": self._latest_logins}, cache_file)
+        os.replace(tmp_path, self.path)
+
+    def _logins_of(self, repo: str, path: str) -> Set[str]:
+        cached = self._latest_logins.get(repo)
+        if cached and cached["path"] == path:
+            return set(cached["logins"])
+        self.files_read += 1
+        return {row["username"] for row in read_rows(path) if row.get("username")}
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,278 @@
+import csv
+import logging
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence
+
+from src.sinks import read_rows
+from src.snapshot_utils import DATA_DIR
+from src.timeline import SnapshotFile, list_snapshots
+
+logger = logging.getLogger(__name__)
+
+WAREHOUSE_PATH = os.path.join(DATA_DIR, "warehouse.sqlite")
+
+STARGAZER_COLUMNS = ['username', 'name', 'email', 'location', 'country', 'company', 'current_position',
+                     'linkedin_headline', 'github_followers', 'linkedin_followers']
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS snapshots ("
+    " id INTEGER PRIMARY KEY,"
+    " path TEXT NOT NULL UNIQUE,"
+    " repo_url TEXT NOT NULL,"
+    " taken_at REAL NOT NULL,"
+    " row_count INTEGER NOT NULL,"
+    " loaded_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS snapshots_repo ON snapshots (repo_url, taken_at)",
+    "CREATE TABLE IF NOT EXISTS stargazers ("
+    " snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),"
+    " username TEXT NOT NULL,"
+    " name TEXT,"
+    " email TEXT,"
+    " location TEXT,"
+    " country TEXT,"
+    " company TEXT,"
+    " company_key TEXT,"  # Lowercased company, what company queries match
+    " current_position TEXT,"
+    " linkedin_headline TEXT,"
+    " github_followers INTEGER NOT NULL DEFAULT 0,"
+    " linkedin_followers INTEGER)",
+    "CREATE INDEX IF NOT EXISTS stargazers_snapshot_username ON stargazers (snapshot_id, username)",
+    "CREATE INDEX IF NOT EXISTS stargazers_snapshot_followers ON stargazers (snapshot_id, github_followers)",
+    "CREATE INDEX IF NOT EXISTS stargazers_username ON stargazers (username)",
+    "CREATE INDEX IF NOT EXISTS stargazers_company ON stargazers (company_key, snapshot_id)",
+    "CREATE INDEX IF NOT EXISTS stargazers_location ON stargazers (country, location)",
+    # When each user was first seen starring each repo, the time of the first snapshot listing them
+    "CREATE TABLE IF NOT EXISTS first_seen ("
+    " repo_url TEXT NOT NULL,"
+    " username TEXT NOT NULL,"
+    " first_seen REAL NOT NULL,"
+    " PRIMARY KEY (repo_url, username)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS first_seen_time ON first_seen (repo_url, first_seen)",
+]
+
+
+def company_of(position: Optional[str]) -> str:
+    """Company of a LinkedIn position or headline, e.g. "CTO at Stealth" or "Engineer @ Acme" -> Stealth/Acme."""
+    match = re.search(r"(?:\s+at\s+|\s*@\s*)([^|,;·]+)", position or "", flags=re.IGNORECASE)
+    return match.group(1).strip() if match else ""
+
+
+def repo_key(repo: str) -> str:
+    """Normalize a repository URL like the snapshot index does. owner/name is short for its github.com URL."""
+    repo = repo.strip().rstrip("/").lower()
+    if re.fullmatch(r"[\w.-]+/[\w.-]+", repo):
+        repo = f"https://github.com/{repo}"
+    return repo
+
+
+class Warehouse:
+    """
+    Append-only SQLite store of every snapshot written by main.py, indexed for cross-repo queries.
+
+    ingest() loads the snapshots that are not in the warehouse yet; snapshot files are never
+    rewritten, so a loaded snapshot is never read again. Each row keeps the snapshot it came
+    from, and queries run on the latest snapshot of each repo unless they ask for history
+    (new_since() uses the time each user was first seen starring a repo).
+    """
+
+    def __init__(self, path: str = WAREHOUSE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def ingest(self, snapshots: Optional[Iterable[SnapshotFile]] = None) -> int:
+        """Load the snapshots (by default all indexed ones in data/) that are not loaded yet. Returns the rows loaded."""
+        snapshots = list_snapshots() if snapshots is None else snapshots
+        loaded = {path for path, in self._conn.execute("SELECT path FROM snapshots")}
+        total_rows = 0
+        for snapshot in snapshots:
+            if snapshot.path in loaded:
+                continue
+            rows = [row for row in read_rows(snapshot.path) if row.get("username")]
+            repo_url = repo_key(snapshot.repo)
+            with self._conn:  # One transaction per snapshot, so an interrupted ingest never loads half a file
+                snapshot_id = self._conn.execute(
+                    "INSERT INTO snapshots (path, repo_url, taken_at, row_count, loaded_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (snapshot.path, repo_url, snapshot.timestamp, len(rows), datetime.now().timestamp()),
+                ).lastrowid
+                self._conn.executemany(
+                    f"INSERT INTO stargazers (snapshot_id, company_key, {', '.join(STARGAZER_COLUMNS)})"
+                    f" VALUES ({', '.join('?' * (len(STARGAZER_COLUMNS) + 2))})",
+                    (self._to_record(snapshot_id, row) for row in rows),
+                )
+                self._conn.executemany(
+                    "INSERT INTO first_seen (repo_url, username, first_seen) VALUES (?, ?, ?)"
+                    " ON CONFLICT (repo_url, username) DO UPDATE SET first_seen = min(first_seen, excluded.first_seen)",
+                    ((repo_url, row["username"], snapshot.timestamp) for row in rows),
+                )
+            logger.info(f"Loaded {len(rows)} rows from {snapshot.path}")
+            total_rows += len(rows)
+        return total_rows
+
+    def overlap(self, repo: str, other_repo: str, limit: Optional[int] = None) -> List[tuple]:
+        """Users who currently star both repos, the most followed first."""
+        return self._conn.execute(
+            "SELECT a.username, a.name, a.github_followers, a.company FROM stargazers a"
+            " JOIN stargazers b ON b.snapshot_id = ? AND b.username = a.username"
+            " WHERE a.snapshot_id = ? ORDER BY a.github_followers DESC LIMIT ?",
+            (self._latest_snapshot(other_repo), self._latest_snapshot(repo), -1 if limit is None else limit),
+        ).fetchall()
+
+    def top_followers(self, repo: Optional[str] = None, limit: int = 20, since: Optional[float] = None) -> List[tuple]:
+        """Most followed current stargazers of a repo (or of all repos), optionally only those first seen since a time."""
+        repos = {self._latest_snapshot(repo): repo_key(repo)} if repo else dict(self._latest_snapshots())
+
+        # The top of each repo is read in index order, then merged, instead of grouping every row by user
+        users = {}
+        for snapshot_id, repo_url in repos.items():
+            if since is None:
+                rows = self._conn.execute(
+                    "SELECT username, name, github_followers, company FROM stargazers"
+                    " WHERE snapshot_id = ? ORDER BY github_followers DESC LIMIT ?", (snapshot_id, limit))
+            else:
+                rows = self._conn.execute(
+                    "SELECT s.username, s.name, s.github_followers, s.company"
+                    " FROM first_seen f JOIN stargazers s ON s.snapshot_id = ? AND s.username = f.username"
+                    " WHERE f.repo_url = ? AND f.first_seen >= ? ORDER BY s.github_followers DESC LIMIT ?",
+                    (snapshot_id, repo_url, since, limit))
+            for row in rows:
+                if row[0] not in users or row[2] > users[row[0]][2]:
+                    users[row[0]] = row
+        top = sorted(users.values(), key=lambda row: (-row[2], row[0]))[:limit]
+
+        # Every repo the top users star, not only those they made the top of
+        starred = {}
+        for username, repo_url in self._conn.execute(
+                "SELECT s.username, snapshots.repo_url FROM stargazers s JOIN snapshots ON snapshots.id = s.snapshot_id"
+                f" WHERE s.username IN ({', '.join('?' * len(top))}) AND s.snapshot_id IN ({', '.join('?' * len(repos))})",
+                [row[0] for row in top] + list(repos)):
+            starred.setdefault(username, []).append(repo_url)
+        return [row + (" ".join(sorted(starred.get(row[0], []))),) for row in top]
+
+    def new_since(self, repo: str, since: float) -> List[tuple]:
+        """Users first seen starring a repo at or after a time, and still starring it."""
+        return self._conn.execute(
+            "SELECT s.username, s.name, s.github_followers, s.company, datetime(f.first_seen, 'unixepoch')"
+            " FROM first_seen f JOIN stargazers s ON s.snapshot_id = ? AND s.username = f.username"
+            " WHERE f.repo_url = ? AND f.first_seen >= ? ORDER BY f.first_seen, s.username",
+            (self._latest_snapshot(repo), repo_key(repo), since),
+        ).fetchall()
+
+    def by_company(self, company: str, repo: Optional[str] = None) -> List[tuple]:
+        """Current stargazers whose company starts with the given name (case-insensitive)."""
+        snapshot_ids = [self._latest_snapshot(repo)] if repo else [snapshot_id for snapshot_id, _ in self._latest_snapshots()]
+        prefix = company.strip().lower()
+        return self._conn.execute(
+            "SELECT s.username, s.name, s.github_followers, s.company, snapshots.repo_url FROM stargazers s"
+            " JOIN snapshots ON snapshots.id = s.snapshot_id"
+            # The unary + keeps SQLite from scanning the whole snapshot instead of the company index
+            f" WHERE s.company_key >= ? AND s.company_key < ? AND +s.snapshot_id IN ({', '.join('?' * len(snapshot_ids))})"
+            " ORDER BY s.github_followers DESC",
+            [prefix, prefix + "\uffff"] + snapshot_ids,
+        ).fetchall()
+
+    def close(self):
+        self._conn.close()
+
+    def _latest_snapshot(self, repo: str) -> int:
+        row = self._conn.execute("SELECT id FROM snapshots WHERE repo_url = ? ORDER BY taken_at DESC LIMIT 1",
+                                 (repo_key(repo),)).fetchone()
+        if row is None:
+            raise ValueError(f"No snapshot of {repo} in the warehouse, run: python -m src.warehouse ingest")
+        return row[0]
+
+    def _latest_snapshots(self) -> List[tuple]:
+        """(id, repo_url) of the latest snapshot of every repo"""
+        return self._conn.execute(
+            "SELECT id, repo_url FROM snapshots s"
+            " WHERE taken_at = (SELECT MAX(taken_at) FROM snapshots WHERE repo_url = s.repo_url)").fetchall()
+
+    @staticmethod
+    def _to_record(snapshot_id: int, row: dict) -> tuple:
+        company = row.get("company") or company_of(row.get("current_position")) or company_of(row.get("linkedin_headline"))
+        values = {**row, "company": company}
+        record = [snapshot_id, company.lower() or None]
+        for column in STARGAZER_COLUMNS:
+            value = values.get(column)
+            if column in ("github_followers", "linkedin_followers"):
+                value = _to_int(value)
+                if column == "github_followers":
+                    value = value or 0
+            elif value in ("", "None"):
+                value = None
+            record.append(value)
+        return tuple(record)
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _print_rows(header: Sequence[str], rows: List[tuple]):
+    writer = csv.writer(sys.stdout)
+    writer.writerow(header)
+    writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load stargazer snapshots into a local warehouse and query them.")
+    parser.add_argument("--db", default=WAREHOUSE_PATH, help=f"Warehouse database (default: {WAREHOUSE_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("ingest", help="Load the snapshots in data/snapshots.jsonl that are not loaded yet")
+    overlap_parser = commands.add_parser("overlap", help="Users who star both repos")
+    overlap_parser.add_argument("repo", help="Repository URL, or owner/name")
+    overlap_parser.add_argument("other_repo", help="Repository URL, or owner/name")
+    overlap_parser.add_argument("-n", "--limit", type=int, default=100,
+                                help="Number of users, 0 for all of them (default: 100)")
+    top_parser = commands.add_parser("top", help="Most followed stargazers")
+    top_parser.add_argument("--repo", help="Only stargazers of this repository (default: all repos)")
+    top_parser.add_argument("-n", "--limit", type=int, default=20, help="Number of users (default: 20)")
+    top_parser.add_argument("--since", type=_parse_date, help="Only users first seen since this date, e.g. 2024-06-01")
+    new_parser = commands.add_parser("new", help="Stargazers first seen since a date")
+    new_parser.add_argument("repo", help="Repository URL, or owner/name")
+    new_parser.add_argument("--since", type=_parse_date, required=True, help="Date, e.g. 2024-06-01")
+    company_parser = commands.add_parser("company", help="Stargazers working at a company")
+    company_parser.add_argument("company", help="Company name, or the start of it")
+    company_parser.add_argument("--repo", help="Only stargazers of this repository (default: all repos)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    warehouse = Warehouse(args.db)
+    try:
+        if args.command == "ingest":
+            logger.info(f"Loaded {warehouse.ingest()} rows into {args.db}")
+        elif args.command == "overlap":
+            _print_rows(["username", "name", "github_followers", "company"],
+                        warehouse.overlap(args.repo, args.other_repo, args.limit or None))
+        elif args.command == "top":
+            _print_rows(["username", "name", "github_followers", "company", "repos"],
+                        warehouse.top_followers(args.repo, args.limit, args.since))
+        elif args.command == "new":
+            _print_rows(["username", "name", "github_followers", "company", "first_seen"],
+                        warehouse.new_since(args.repo, args.since))
+        elif args.command == "company":
+            _print_rows(["username", "name", "github_followers", "company", "repo_url"],
+                        warehouse.by_company(args.company, args.repo))
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        warehouse.close()
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.snapshot_utils import DATA_DIR, _normalize_repo_url
+
+WATCH_STATE_PATH = os.path.join(DATA_DIR, "watch_state.json")
+
+logger = logging.getLogger(__name__)
+
+
+class WatchState:
+    """
+    Last seen star count and next scheduled check of every watched repository.
+
+    Kept in a JSON file keyed by repository URL, which is replaced atomically on save()
+    so a watcher killed mid-write never leaves a corrupt state behind.
+    """
+
+    def __init__(self, path: str = WATCH_STATE_PATH):
+        self.path = path
+        self._repos: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as state_file:
+                self._repos = json.load(state_file)
+
+    def num_stars(self, repo_url: str) -> Optional[int]:
+        return self._repos.get(_normalize_repo_url(repo_url), {}).get("num_stars")
+
+    def next_check(self, repo_url: str) -> Optional[float]:
+        return self._repos.get(_normalize_repo_url(repo_url), {}).get("next_check")
+
+    def record_stars(self, repo_url: str, num_stars: int):
+        entry = self._repos.setdefault(_normalize_repo_url(repo_url), {})
+        entry["num_stars"] = num_stars
+        entry["updated_at"] = time.time()
+
+    def schedule(self, repo_url: str, next_check: float):
+        self._repos.setdefault(_normalize_repo_url(repo_url), {})["next_check"] = next_check
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(self._repos, state_file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class RepoWatcher:
+    """
+    Periodically probes repositories and only runs a full scrape for the ones whose star count changed.
+
+    probe(repo_url) returns the current star count, which is one cheap request per repository.
+    run(repo_urls) is called once per cycle with every changed repository, and the new star counts
+    are only recorded once it returns, so a failed run is retried on the next cycle. Each repository
+    is checked every interval seconds, randomly stretched or shortened by up to jitter * interval so
+    checks of many repositories spread out instead of all landing at once.
+    """
+
+    def __init__(self, repo_urls: List[str], probe: Callable[[str], int], run: Callable[[List[str]], None],
+                 interval: float = 3600, jitter: float = 0.1, state: Optional[WatchState] = None):
+        self.repo_urls = repo_urls
+        self.probe = probe
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        self.state = state or WatchState()
+
+        # Repos never checked before (or overdue) are spread over the first jitter window
+        now = time.time()
+        for repo_url in repo_urls:
+            next_check = self.state.next_check(repo_url)
+            if next_check is None or next_check < now:
+                self.state.schedule(repo_url, now + random.uniform(0, self.interval * self.jitter))
+        self.state.save()
+
+    def watch(self, max_cycles: Optional[int] = None):
+        """Check repositories as they become due, forever or for max_cycles cycles."""
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            next_due = min(self.state.next_check(repo_url) for repo_url in self.repo_urls)
+            delay = next_due - time.time()
+            if delay > 0:
+                logger.debug(f"Next check in {delay:.0f}s")
+                time.sleep(delay)
+            self.check_due()
+            cycles += 1
+
+    def check_due(self) -> List[str]:
+        """Probe every repository that is due, run the changed ones and return their URLs."""
+        now = time.time()
+        due = [repo_url for repo_url in self.repo_urls if self.state.next_check(repo_url) <= now]
+        changed = {}
+        for repo_url in due:
+            try:
+                num_stars = self.probe(repo_url)
+            except Exception as e:
+                logger.error(f"Error checking {repo_url}: {str(e)}")
+                continue
+            finally:
+                self.state.schedule(repo_url, self._next_check_time())
+            previous = self.state.num_stars(repo_url)
+            if num_stars != previous:
+                logger.info(f"{repo_url}: {previous if previous is not None else 'unknown'} -> {num_stars} stars")
+                changed[repo_url] = num_stars
+        logger.info(f"Checked {len(due)} repos, {len(changed)} changed")
+
+        if changed:
+            try:
+                self.run(list(changed))
+            except Exception as e:
+                logger.error(f"Error scraping changed repos, retrying on the next check: {str(e)}")
+            else:
+                for repo_url, num_stars in changed.items():
+                    self.state.record_stars(repo_url, num_stars)
+        self.state.save()
+        return list(changed)
+
+    def _next_check_time(self) -> float:
+        return time.time() + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
@@ -0,0 +1,116 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class GitHubStub:
+    """
+    Local stand-in for the GitHub REST and GraphQL APIs, for GitHubAPIUtils(api_url=stub.url).
+
+    Repos map "owner/name" to their description and (login, starred_at) stargazers, oldest
+    first, and users map logins to the GraphQL fields of the user. fail() queues error responses
+    that are answered before the normal ones, and every request is recorded in requests.
+    """
+
+    def __init__(self):
+        self.repos: Dict[str, dict] = {}
+        self.users: Dict[str, dict] = {}
+        self.requests: List[Tuple[str, str, dict]] = []  # (method, path, query parameters)
+        self._failures: List[Tuple[str, Optional[int], Optional[str]]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def add_repo(self, name: str, description: str = "A stub repo", stargazers: List[str] = ()):
+        self.repos[name] = {"description": description,
+                            "stargazers": [(login, f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z")
+                                           for i, login in enumerate(stargazers)]}
+
+    def add_user(self, login: str, **fields):
+        self.users[login] = {"login": login, "name": f"Name of {login}", "location": "", "email": "", "bio": None,
+                             "websiteUrl": None, "twitterUsername": None, "followers": {"totalCount": 0},
+                             "socialAccounts": {"nodes": []}, **fields}
+
+    def fail(self, path: str, status: Optional[int] = None, graphql_error: Optional[str] = None, times: int = 1):
+        """Answer the next `times` requests to path with an HTTP status, or a GraphQL error without data."""
+        with self._lock:
+            self._failures.extend([(path, status, graphql_error)] * times)
+
+    def count(self, path: str) -> int:
+        return sum(1 for _, request_path, _ in self.requests if request_path == path)
+
+    def start(self) -> "GitHubStub":
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _take_failure(self, path: str):
+        with self._lock:
+            for index, failure in enumerate(self._failures):
+                if failure[0] == path:
+                    return self._failures.pop(index)
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                stub.requests.append(("GET", url.path, query))
+                if self._failed(url.path):
+                    return
+                parts = url.path.strip("/").split("/")
+                repo = stub.repos.get("/".join(parts[1:3])) if parts[0] == "repos" and len(parts) >= 3 else None
+                if repo is None:
+                    return self._send({"message": "Not Found"}, status=404)
+                if len(parts) == 3:
+                    return self._send({"name": parts[2], "description": repo["description"],
+                                       "stargazers_count": len(repo["stargazers"])})
+                per_page, page = int(query.get("per_page", 30)), int(query.get("page", 1))
+                page_items = repo["stargazers"][(page - 1) * per_page:page * per_page]
+                self._send([{"starred_at": starred_at, "user": {"login": login}} for login, starred_at in page_items])
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(("POST", self.path, {}))
+                if self._failed(self.path):
+                    return
+                data, errors = {}, []
+                for alias, login in re.findall(r'(u\d+): user\(login: "([^"]+)"\)', body["query"]):
+                    data[alias] = stub.users.get(login)
+                    if data[alias] is None:
+                        errors.append({"type": "NOT_FOUND", "path": [alias],
+                                       "message": f"Could not resolve to a User with the login of '{login}'."})
+                self._send({"data": data, **({"errors": errors} if errors else {})})
+
+            def _failed(self, path):
+                failure = stub._take_failure(path)
+                if failure is None:
+                    return False
+                _, status, graphql_error = failure
+                if status:
+                    self._send({"message": f"Stub error {status}"}, status=status)
+                else:
+                    self._send({"data": None, "errors": [{"type": graphql_error, "message": "Stub error"}]})
+                return True
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
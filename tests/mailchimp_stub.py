@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+
+class MailchimpStub:
+    """
+    Local stand-in for the Mailchimp API v3 endpoints MailchimpAdapter uses, for MAILCHIMP_API_URL=stub.url.
+
+    Members and static segments (tags) are kept per list. Emails in rejected are reported as
+    errors by the batch subscribe endpoint, and fail() queues failures of the next requests to a
+    path: an HTTP status, or a dropped connection. Every request is recorded in requests.
+    """
+
+    def __init__(self):
+        self.members: Dict[str, Set[str]] = {}
+        self.segments: Dict[str, Dict[int, dict]] = {}  # list id -> segment id -> {"name", "members"}
+        self.rejected: Set[str] = set()
+        self.requests: List[Tuple[str, str, Optional[dict]]] = []  # (method, path, body)
+        self._failures: List[Tuple[str, Optional[int]]] = []
+        self._next_segment_id = 1000
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/3.0"
+
+    def add_segment(self, list_id: str, name: str) -> int:
+        with self._lock:
+            segment_id = self._next_segment_id
+            self._next_segment_id += 1
+            self.segments.setdefault(list_id, {})[segment_id] = {"name": name, "members": set()}
+        return segment_id
+
+    def fail(self, path: str, status: Optional[int] = None, times: int = 1):
+        """Answer the next `times` requests to path with an HTTP status, or drop the connection without one."""
+        with self._lock:
+            self._failures.extend([(path, status)] * times)
+
+    def count(self, method: str, path: str) -> int:
+        return sum(1 for request_method, request_path, _ in self.requests
+                   if request_method == method and request_path == path)
+
+    def start(self) -> "MailchimpStub":
+        threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _take_failure(self, path: str):
+        with self._lock:
+            for index, failure in enumerate(self._failures):
+                if failure[0] == path:
+                    return self._failures.pop(index)
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                stub.requests.append(("GET", path, None))
+                if self._failed(path):
+                    return
+                parts = path.strip("/").split("/")  # 3.0/lists/<list id>/segments
+                segments = stub.segments.get(parts[2], {})
+                self._send({"segments": [{"id": segment_id, "name": segment["name"]}
+                                         for segment_id, segment in segments.items()],
+                            "total_items": len(segments)})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(("POST", path, body))
+                if self._failed(path):
+                    return
+                parts = path.strip("/").split("/")
+                list_id = parts[2]
+                if len(parts) == 3:
+                    # Batch subscribe
+                    emails = [member["email_address"] for member in body["members"]]
+                    accepted = [email for email in emails if email not in stub.rejected]
+                    stub.members.setdefault(list_id, set()).update(accepted)
+                    return self._send({"new_members": [{"email_address": email} for email in accepted],
+                                       "updated_members": [], "error_count": len(emails) - len(accepted),
+                                       "errors": [{"email_address": email, "error": f"{email} looks fake or invalid"}
+                                                  for email in emails if email in stub.rejected]})
+                if len(parts) == 4:
+                    return self._send({"id": stub.add_segment(list_id, body["name"]), "name": body["name"]})
+                segment = stub.segments.get(list_id, {}).get(int(parts[4]))
+                if segment is None:
+                    return self._send({"status": 404, "title": "Resource Not Found"}, status=404)
+                unknown = [email for email in body["members_to_add"] if email not in stub.members.get(list_id, set())]
+                segment["members"].update(email for email in body["members_to_add"] if email not in unknown)
+                self._send({"members_added": [{"email_address": email} for email in body["members_to_add"]
+                                              if email not in unknown],
+                            "errors": [{"email_addresses": unknown, "error": "Email addresses are not subscribed"}]
+                            if unknown else []})
+
+            def _failed(self, path):
+                failure = stub._take_failure(path)
+                if failure is None:
+                    return False
+                if failure[1] is None:
+                    self.close_connection = True
+                    self.connection.close()
+                else:
+                    self._send({"status": failure[1], "title": "Stub error"}, status=failure[1])
+                return True
+
+            def _send(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
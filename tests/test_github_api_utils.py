@@ -0,0 +1,166 @@
+import socket
+
+import pytest
+
+from github_stub import GitHubStub
+from src.github_api_utils import GITHUB_API_PAGE_SIZE, GitHubAPIError, GitHubAPIUtils
+from src.multion_utils import GitHubUserData
+from src.resilience import EmptyResponseError, Resilience, RetryPolicy, is_retryable
+
+REPO_URL = "https://github.com/kingjulio8238/startrack"
+
+
+class FakeFallback:
+    """Stands in for MultiOnUtils as the fallback scraper, with LinkedIn URLs per login."""
+
+    def __init__(self, linkedin_urls=None, failing=()):
+        self.linkedin_urls = linkedin_urls or {}
+        self.failing = set(failing)
+        self.scraped = []
+        self.pool_size = 2
+
+    def scrape_github(self, user):
+        self.scraped.append(user)
+        if user in self.failing:
+            raise RuntimeError(f"MultiOn could not load the profile of {user}")
+        return GitHubUserData(name=user, num_followers=0, location="", linkedin_url=self.linkedin_urls.get(user),
+                              twitter_url=None, email=f"{user}@scraped.dev", username=user)
+
+
+@pytest.fixture
+def stub():
+    stub = GitHubStub().start()
+    yield stub
+    stub.stop()
+
+
+def make_api(stub, fallback=None, max_attempts=3):
+    return GitHubAPIUtils(token="token", api_url=stub.url, fallback=fallback,
+                          resilience=Resilience(RetryPolicy(max_attempts=max_attempts, base_delay=0)))
+
+
+def test_stargazers_are_read_page_by_page(stub):
+    logins = [f"user{i}" for i in range(250)]
+    stub.add_repo("kingjulio8238/startrack", description="Track your stars", stargazers=logins)
+    api = make_api(stub)
+
+    assert api.scrape_repo(REPO_URL).num_stars == 250
+    stargazers = api.scrape_stargazers(REPO_URL)
+    assert [stargazer.user_id for stargazer in stargazers] == logins
+    assert stargazers[0].starred_at == "2024-01-01T00:00:00Z"
+    assert stub.count("/repos/kingjulio8238/startrack/stargazers") == 3
+
+    assert len(api.scrape_stargazers(REPO_URL, max_stargazers=120)) == 120
+
+
+def test_known_stargazer_pages_are_skipped(stub):
+    logins = [f"user{i}" for i in range(370)]
+    stub.add_repo("kingjulio8238/startrack", stargazers=logins)
+
+    stargazers = list(make_api(stub).iter_stargazers(REPO_URL, known=logins[:350]))
+
+    assert [stargazer.user_id for stargazer in stargazers] == logins
+    # Pages 3 and 4 are read, the users of pages 1 and 2 come from the known listing
+    assert [query["page"] for _, _, query in stub.requests] == ["3", "4"]
+    assert stargazers[199].starred_at is None and stargazers[200].starred_at is not None
+
+
+def test_all_pages_are_read_when_known_stargazers_unstarred(stub):
+    logins = [f"user{i}" for i in range(370)]
+    stub.add_repo("kingjulio8238/startrack", stargazers=logins[:5] + logins[6:])
+
+    stargazers = list(make_api(stub).iter_stargazers(REPO_URL, known=logins[:350]))
+
+    assert [stargazer.user_id for stargazer in stargazers] == logins[:5] + logins[6:]
+    assert [query["page"] for _, _, query in stub.requests] == ["3", "1", "2", "3", "4"]
+
+
+def test_users_are_looked_up_in_batches(stub):
+    for i in range(150):
+        stub.add_user(f"user{i}", followers={"totalCount": i}, email=f"user{i}@example.com")
+    users = make_api(stub).scrape_github_batch([f"user{i}" for i in range(150)] + ["ghost"])
+
+    assert stub.count("/graphql") == 2
+    assert [user.username for user in users[:150]] == [f"user{i}" for i in range(150)]
+    assert users[42].num_followers == 42 and users[42].email == "user42@example.com"
+    # Unknown logins come back empty instead of failing the batch
+    assert users[150] == GitHubUserData(name="", num_followers=0, location="", linkedin_url=None,
+                                        twitter_url=None, email="", username="ghost")
+
+
+def test_linkedin_url_is_read_from_social_accounts_website_and_bio(stub):
+    stub.add_user("social", socialAccounts={"nodes": [{"provider": "LINKEDIN", "url": "https://www.linkedin.com/in/social"}]})
+    stub.add_user("website", websiteUrl="https://linkedin.com/in/website/")
+    stub.add_user("bio", bio="Building agents. Find me at linkedin.com/in/bio-person, or not.")
+    stub.add_user("nothing", bio="No links here", websiteUrl="https://example.com")
+    fallback = FakeFallback(linkedin_urls={"nothing": "https://www.linkedin.com/in/nothing"})
+
+    users = make_api(stub, fallback=fallback).scrape_github_batch(["social", "website", "bio", "nothing", "ghost"])
+
+    assert [user.linkedin_url for user in users] == [
+        "https://www.linkedin.com/in/social",
+        "https://linkedin.com/in/website",
+        "https://linkedin.com/in/bio-person",
+        "https://www.linkedin.com/in/nothing",
+        None,
+    ]
+    # Only the user the API had no LinkedIn URL for is scraped, unknown users are not
+    assert fallback.scraped == ["nothing"]
+    assert users[3].email == "nothing@scraped.dev"
+
+
+def test_failed_fallback_scrape_keeps_the_api_data(stub):
+    stub.add_user("alice", email="alice@example.com", location="Paris")
+    stub.add_user("bob")
+    fallback = FakeFallback(linkedin_urls={"bob": "https://www.linkedin.com/in/bob"}, failing={"alice"})
+
+    users = make_api(stub, fallback=fallback).scrape_github_batch(["alice", "bob"])
+
+    assert users[0].location == "Paris" and users[0].email == "alice@example.com"
+    assert users[0].linkedin_url is None
+    assert users[1].linkedin_url == "https://www.linkedin.com/in/bob"
+
+
+def test_graphql_errors_other_than_not_found_are_retried(stub):
+    stub.add_user("alice")
+    stub.fail("/graphql", graphql_error="RATE_LIMITED")
+
+    users = make_api(stub).scrape_github_batch(["alice"])
+
+    assert users[0].name == "Name of alice"
+    assert stub.count("/graphql") == 2
+
+    stub.fail("/graphql", graphql_error="RATE_LIMITED", times=2)
+    with pytest.raises(EmptyResponseError):
+        make_api(stub, max_attempts=2).scrape_github_batch(["alice"])
+
+
+def test_transient_rest_errors_are_retried(stub):
+    stub.add_repo("kingjulio8238/startrack", stargazers=[f"user{i}" for i in range(GITHUB_API_PAGE_SIZE + 5)])
+    stub.fail("/repos/kingjulio8238/startrack", status=502)
+    stub.fail("/repos/kingjulio8238/startrack/stargazers", status=429)
+    api = make_api(stub)
+
+    assert api.scrape_repo(REPO_URL).num_stars == GITHUB_API_PAGE_SIZE + 5
+    assert len(api.scrape_stargazers(REPO_URL)) == GITHUB_API_PAGE_SIZE + 5
+    assert stub.count("/repos/kingjulio8238/startrack/stargazers") == 3
+
+
+def test_permanent_rest_errors_are_not_retried(stub):
+    api = make_api(stub)
+    with pytest.raises(GitHubAPIError) as error:
+        api.scrape_repo("https://github.com/kingjulio8238/missing")
+    assert error.value.code == 404
+    assert stub.count("/repos/kingjulio8238/missing") == 1
+
+
+def test_connection_errors_are_retryable():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    api = GitHubAPIUtils(token="token", api_url=f"http://127.0.0.1:{port}", timeout=1,
+                         resilience=Resilience(RetryPolicy(max_attempts=1)))
+
+    with pytest.raises(ConnectionError) as error:
+        api.scrape_repo(REPO_URL)
+    assert is_retryable(error.value)
@@ -0,0 +1,11 @@
+from benchmarks.import_time import measure_import
+
+# Same default budget as python -m benchmarks.import_time
+IMPORT_BUDGET_SECONDS = 0.5
+
+
+def test_importing_main_is_fast_and_lazy():
+    result = measure_import(repeat=3)
+
+    assert result["eager_modules"] == []
+    assert result["seconds"] <= IMPORT_BUDGET_SECONDS
@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("mailchimp3")
+
+from mailchimp_stub import MailchimpStub
+from src.mailchimp_adapter import MAILCHIMP_BATCH_SIZE, MailchimpAdapter
+
+LIST_ID = "audience1"
+LIST_PATH = f"/3.0/lists/{LIST_ID}"
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    stub = MailchimpStub().start()
+    monkeypatch.chdir(tmp_path)  # The tag cache is written to data/
+    monkeypatch.setenv("MAILCHIMP_USER_ID", "startrack")
+    monkeypatch.setenv("MAILCHIMP_API_KEY", "0" * 32 + "-us1")
+    monkeypatch.setenv("MAILCHIMP_LIST_ID", LIST_ID)
+    monkeypatch.setenv("MAILCHIMP_API_URL", stub.url)
+    yield stub
+    stub.stop()
+
+
+def emails(count, start=0):
+    return [f"stargazer{i}@example.com" for i in range(start, start + count)]
+
+
+def test_emails_are_synced_in_batches(stub):
+    failed = MailchimpAdapter().process_emails(emails(1200) + emails(10), "tag_startrack")
+
+    assert failed == {}
+    assert stub.count("POST", LIST_PATH) == 3
+    (segment_id, segment), = stub.segments[LIST_ID].items()
+    assert segment["name"] == "tag_startrack" and len(segment["members"]) == 1200
+    assert stub.count("POST", f"{LIST_PATH}/segments/{segment_id}") == 3
+    assert max(len(body["members"]) for method, path, body in stub.requests
+               if method == "POST" and path == LIST_PATH) == MAILCHIMP_BATCH_SIZE
+
+
+def test_tag_ids_are_cached(stub):
+    MailchimpAdapter().process_emails(emails(3), "tag_startrack")
+    MailchimpAdapter().process_emails(emails(3, start=3), "tag_startrack")
+
+    assert stub.count("GET", f"{LIST_PATH}/segments") == 1
+    assert stub.count("POST", f"{LIST_PATH}/segments") == 1
+
+
+def test_rejected_emails_are_reported_and_not_tagged(stub):
+    stub.rejected = {"stargazer1@example.com"}
+
+    failed = MailchimpAdapter().process_emails(emails(3), "tag_startrack")
+
+    assert list(failed) == ["stargazer1@example.com"]
+    segment, = stub.segments[LIST_ID].values()
+    assert segment["members"] == {"stargazer0@example.com", "stargazer2@example.com"}
+
+
+def test_deleted_tag_is_looked_up_again(stub):
+    MailchimpAdapter().process_emails(emails(1), "tag_startrack")
+    stub.segments[LIST_ID].clear()  # The tag was deleted in Mailchimp, its id is still cached
+
+    failed = MailchimpAdapter().process_emails(emails(2, start=1), "tag_startrack")
+
+    assert failed == {}
+    segment, = stub.segments[LIST_ID].values()
+    assert segment["members"] == {"stargazer1@example.com", "stargazer2@example.com"}
+
+
+@pytest.mark.parametrize("status", [None, 500])
+def test_tag_errors_fail_only_their_batch(stub, status):
+    segment_id = stub.add_segment(LIST_ID, "tag_startrack")
+    stub.fail(f"{LIST_PATH}/segments/{segment_id}", status=status)
+
+    failed = MailchimpAdapter().process_emails(emails(MAILCHIMP_BATCH_SIZE + 2), "tag_startrack")
+
+    # The members of the first batch were added to the list but not to the tag, the second batch went through
+    assert sorted(failed) == sorted(emails(MAILCHIMP_BATCH_SIZE))
+    assert len(stub.members[LIST_ID]) == MAILCHIMP_BATCH_SIZE + 2
+    assert stub.segments[LIST_ID][segment_id]["members"] == set(emails(2, start=MAILCHIMP_BATCH_SIZE))
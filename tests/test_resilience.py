@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from src.resilience import CircuitBreaker, CircuitOpenError, EmptyResponseError, Resilience, RetryPolicy
+
+
+class FlakyTarget:
+    """Fails with a transient error the first `failures` calls, then succeeds."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise EmptyResponseError("empty page")
+        return value
+
+
+def make_resilience(max_attempts: int, reset_seconds: float = 0.05) -> Resilience:
+    return Resilience(RetryPolicy(max_attempts=max_attempts, base_delay=0), failure_threshold=2,
+                      reset_seconds=reset_seconds)
+
+
+def test_circuit_opens_half_opens_and_closes_within_one_run():
+    resilience = make_resilience(max_attempts=5)
+    target = FlakyTarget(failures=2)
+
+    start = time.monotonic()
+    assert resilience.call("github", "github_profile", target, "areibman") == "areibman"
+
+    breaker = resilience.breakers["github"]
+    # The two failures opened the circuit, the third attempt waited for it to half-open and was the trial
+    assert target.calls == 3
+    assert time.monotonic() - start >= 0.05
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    # Later calls go straight through
+    assert resilience.call("github", "github_profile", target, "kingjulio8238") == "kingjulio8238"
+    assert target.calls == 4
+
+
+def test_calls_wait_for_the_trial_call_while_open():
+    resilience = make_resilience(max_attempts=2)
+    target = FlakyTarget(failures=2)
+    with pytest.raises(EmptyResponseError):
+        resilience.call("github", "github_profile", target, "first")
+    assert resilience.breakers["github"].state == CircuitBreaker.OPEN
+
+    results = []
+    threads = [threading.Thread(target=lambda user=user: results.append(
+        resilience.call("github", "github_profile", target, user))) for user in ("a", "b", "c", "d")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert sorted(results) == ["a", "b", "c", "d"]
+    assert target.calls == 6  # One trial call closed the circuit, no call failed fast
+    assert resilience.breakers["github"].state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker("linkedin", failure_threshold=1, reset_seconds=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    breaker.before_call()  # Waits out reset_seconds, then is the trial call
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    waiter_errors = []
+
+    def wait_for_trial():
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            waiter_errors.append(e)
+
+    waiter = threading.Thread(target=wait_for_trial)
+    waiter.start()
+    time.sleep(0.01)
+    breaker.record_failure()
+    waiter.join(timeout=5)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert len(waiter_errors) == 1
+
+
+def test_site_that_stays_down_fails_once_attempts_are_used_up():
+    resilience = make_resilience(max_attempts=3, reset_seconds=0.01)
+    target = FlakyTarget(failures=100)
+    with pytest.raises(EmptyResponseError):
+        resilience.call("github", "repo", target, "https://github.com/kingjulio8238/startrack")
+    assert target.calls == 3
+
+
+def test_hedges_in_flight_are_capped():
+    resilience = Resilience(RetryPolicy(max_attempts=1), hedge=True, hedge_budget=1.0, max_concurrent_hedges=1)
+    for _ in range(20):
+        resilience.call("linkedin", "profile", lambda: None)
+    calls = []
+    release = threading.Event()
+
+    def slow_scrape(value):
+        calls.append(value)
+        release.wait(1)
+        return value
+
+    threads = [threading.Thread(target=resilience.call, args=("linkedin", "profile", slow_scrape, value))
+               for value in ("alice", "bob")]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    # Both calls are slower than the p95, but only one of them may hold a second session
+    assert len(calls) == 3
+    assert resilience.hedge_capacity() == 1
+    release.set()
+    for thread in threads:
+        thread.join()
+    resilience.close()